@@ -1,6 +1,7 @@
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 from cellgraph import CellGraph, System, COLORS
-from random import randint
+from random import Random
+import numpy as np
 
 
 class BihamLevine(System):
@@ -13,30 +14,44 @@ class BihamLevine(System):
 
     def __init__(self, name, width, height, colors, filename=None):
         if filename:
-            matrix = self.getMatrixFromFile(filename)
+            matrix = self.buildMatrix(self.getMatrixFromFile(filename))
         else:
-            matrix = [[0] * width for i in range(height)]
+            matrix = self.emptyMatrix(width, height)
 
         super(BihamLevine, self).__init__(matrix, colors, name=name,
                                           possibleValues=[0, 1, 2])
 
         self.turn = 0
 
-    def __putCars(self, number, tp):
-        """tipo 1 para vertical, tipo 2 para horizontal"""
-        ready = number
-        while ready != 0:
-            i = randint(0, self.height - 1)
-            j = randint(0, self.width - 1)
+    def buildMatrix(self, matrix):
+        """convierte la lista de listas a la representacion del tablero que
+           usa el motor"""
+        return matrix
+
+    def emptyMatrix(self, width, height):
+        """retorna un tablero vacio en la representacion del motor"""
+        return [[0] * width for i in range(height)]
 
-            if not self.matrix[i][j]:
-                self.matrix[i][j] = tp
-                ready -= 1
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix = self.emptyMatrix(self.width, self.height)
 
-    def putCars(self, vertical=0, horizontal=0):
+    def getFrame(self):
+        """retorna el cuadro del diagrama espacio-tiempo, el tipo de carro de
+           cada celda(0 si esta vacia). Como un carro avanza a lo sumo una
+           celda, su velocidad se obtiene de dos cuadros seguidos"""
+        return np.array(self.matrix, dtype=np.uint8)
+
+    def __putCars(self, number, tp, generator=None):
+        """tipo 1 para vertical, tipo 2 para horizontal"""
+        for i, j in self.getEmptyCells(number, generator=generator):
+            self.matrix[i][j] = tp
+
+    def putCars(self, vertical=0, horizontal=0, generator=None):
         if vertical + horizontal <= self.width * self.height:
-            self.__putCars(vertical, 1)
-            self.__putCars(horizontal, 2)
+            self.__putCars(vertical, 1, generator)
+            self.__putCars(horizontal, 2, generator)
 
     def findCeroFromColumn(self, column):
         for i in range(self.height):
@@ -48,34 +63,395 @@ class BihamLevine(System):
             if self.matrix[row][j] == 0:
                 return j
 
+    def moveCar(self, row, column, newRow, newColumn):
+        """mueve el carro de la celda row, column a la celda vacia newRow,
+           newColumn"""
+        self.matrix[newRow][newColumn] = self.matrix[row][column]
+        self.matrix[row][column] = 0
+
     def updateVertical(self):
+        """mueve los carros verticales cuya celda de abajo esta vacia, todos
+           a la vez. Cada columna se recorre en la direccion del movimiento
+           empezando despues de una celda vacia y saltando la celda a la que
+           llega cada carro, asi cada carro ve la celda de adelante como
+           estaba antes del paso. Retorna el numero de
+           carros que se movieron"""
+        moved = 0
+
         for column in range(self.width):
             zero = self.findCeroFromColumn(column)
             if isinstance(zero, int):
-                for i in range(self.height):
-                    row = (zero - i) % self.height
+                i = 1
+                while i < self.height:
+                    row = (zero + i) % self.height
                     if (self.matrix[row][column] == 1 and
                             self.matrix[(row + 1) % self.height][column] == 0):
-                        self.matrix[(row + 1) % self.height][column] = 1
-                        self.matrix[row][column] = 0
+                        self.moveCar(row, column, (row + 1) % self.height,
+                                     column)
+                        moved += 1
+                        # la celda a la que llego estaba vacia
+                        i += 1
+                    i += 1
+
+        return moved
 
     def updateHorizontal(self):
+        """igual que updateVertical para los carros horizontales, que se
+           mueven a la derecha"""
+        moved = 0
+
         for row in range(self.height):
             zero = self.findCeroFromRow(row)
             if isinstance(zero, int):
-                for j in range(self.width):
-                    column = (zero - j) % self.width
+                j = 1
+                while j < self.width:
+                    column = (zero + j) % self.width
                     if (self.matrix[row][column] == 2 and
                             self.matrix[row][(column + 1) % self.width] == 0):
-                        self.matrix[row][(column + 1) % self.width] = 2
-                        self.matrix[row][column] = 0
+                        self.moveCar(row, column, row,
+                                     (column + 1) % self.width)
+                        moved += 1
+                        j += 1
+                    j += 1
+
+        return moved
 
     def update(self):
         self.turn = (self.turn + 1) % 2
         if self.turn:
-            self.updateVertical()
+            self.moved = self.updateVertical()
         else:
-            self.updateHorizontal()
+            self.moved = self.updateHorizontal()
+
+
+def moveCars(boards, tp, axis):
+    """mueve los carros de tipo tp de boards una celda sobre axis(-2 hacia
+       abajo, -1 hacia la derecha) si la celda de adelante esta vacia, las
+       calles dan la vuelta. Retorna el arreglo booleano de los carros que
+       se movieron"""
+    def part(start, stop=None):
+        index = [slice(None)] * boards.ndim
+        index[axis] = slice(start, stop)
+        return tuple(index)
+
+    empty = boards == 0
+    moving = boards == tp
+    moving[part(None, -1)] &= empty[part(1)]
+    moving[part(-1)] &= empty[part(None, 1)]
+
+    # se quitan los carros y se ponen en la celda de adelante sumando
+    step = moving.view(np.uint8) * np.uint8(tp)
+    boards -= step
+    boards[part(1)] += step[part(None, -1)]
+    boards[part(None, 1)] += step[part(-1)]
+
+    return moving
+
+
+class ArrayBihamLevine(BihamLevine):
+    """BihamLevine sobre un arreglo de numpy: en cada medio paso los carros
+       que se mueven son los que tienen la celda de adelante vacia, se
+       encuentran todos con una sola comparacion contra el tablero desplazado
+       una celda y se mueven a la vez"""
+
+    def buildMatrix(self, matrix):
+        return np.array(matrix, dtype=np.uint8)
+
+    def emptyMatrix(self, width, height):
+        return np.zeros((height, width), dtype=np.uint8)
+
+    def getEmptyCells(self, number, empty=None, generator=None):
+        """igual que System.getEmptyCells(mismas celdas para la misma
+           semilla) sin recorrer el tablero en python"""
+        empty = self.nullCell if empty is None else empty
+        free = np.flatnonzero(self.matrix == empty)
+
+        if number > len(free):
+            raise ValueError('there are only %s empty cells' % len(free))
+
+        chosen = (generator or Random()).sample(range(len(free)), number)
+        return [divmod(int(free[k]), self.width) for k in chosen]
+
+    def updateVertical(self):
+        return int(np.count_nonzero(moveCars(self.matrix, 1, -2)))
+
+    def updateHorizontal(self):
+        return int(np.count_nonzero(moveCars(self.matrix, 2, -1)))
+
+
+class EnsembleBihamLevine(ArrayBihamLevine):
+    """realizations tableros del mismo tamano guardados en un solo arreglo
+       boards de forma (realizations, height, width) que avanzan juntos en
+       cada update. self.matrix es una vista del tablero shown y self.moved
+       es el arreglo con los carros que se movieron en cada tablero"""
+
+    def __init__(self, name, width, height, colors, filename=None,
+                 realizations=16):
+        self.realizations = realizations
+        self.shown = 0
+
+        super(EnsembleBihamLevine, self).__init__(name, width, height,
+                                                  colors, filename=filename)
+
+    def buildMatrix(self, matrix):
+        matrix = np.array(matrix, dtype=np.uint8)
+        self.boards = np.repeat(matrix[np.newaxis], self.realizations, 0)
+
+        return self.boards[self.shown]
+
+    def emptyMatrix(self, width, height):
+        return self.buildMatrix(np.zeros((height, width), dtype=np.uint8))
+
+    def clear(self, key):
+        """limpia todos los tableros"""
+        if key == 'c':
+            self.boards[:] = 0
+
+    def putCars(self, vertical=0, horizontal=0, generator=None):
+        """pone los carros en cada tablero, uno despues de otro con el mismo
+           generator, asi cada tablero tiene una configuracion distinta y el
+           ensamble es reproducible con la semilla"""
+        generator = generator or Random()
+
+        for board in self.boards:
+            self.matrix = board
+            super(EnsembleBihamLevine, self).putCars(vertical, horizontal,
+                                                     generator)
+
+        self.matrix = self.boards[self.shown]
+
+    def updateVertical(self):
+        return np.count_nonzero(moveCars(self.boards, 1, -2), axis=(1, 2))
+
+    def updateHorizontal(self):
+        return np.count_nonzero(moveCars(self.boards, 2, -1), axis=(1, 2))
+
+    def run(self, steps):
+        """avanza steps pasos completos(dos medios pasos, empezando por el
+           que le toca segun self.turn) y retorna un arreglo de forma (steps,
+           realizations) con los carros que se movieron en cada paso de cada
+           tablero"""
+        moved = np.zeros((steps, self.realizations), dtype=np.int64)
+
+        for step in range(steps):
+            for half in range(2):
+                self.update()
+                moved[step] += self.moved
+
+        return moved
+
+
+def getRuns(lane, tp):
+    """retorna las corridas [inicio, largo] de celdas iguales a tp de una
+       calle circular, ordenadas por inicio. La ultima corrida puede dar la
+       vuelta(inicio + largo mayor al largo de la calle)"""
+    runs = []
+
+    for position, value in enumerate(lane):
+        if value != tp:
+            continue
+        if runs and runs[-1][0] + runs[-1][1] == position:
+            runs[-1][1] += 1
+        else:
+            runs.append([position, 1])
+
+    return mergeRuns(runs, len(lane))
+
+
+def mergeRuns(runs, size):
+    """ordena las corridas y une las que quedan pegadas, incluida la ultima
+       con la primera si se tocan dando la vuelta"""
+    runs.sort()
+    merged = []
+
+    for run in runs:
+        if merged and merged[-1][0] + merged[-1][1] == run[0]:
+            merged[-1][1] += run[1]
+        else:
+            merged.append(run)
+
+    if (len(merged) > 1 and
+            merged[-1][0] + merged[-1][1] == merged[0][0] + size):
+        merged[-1][1] += merged.pop(0)[1]
+
+    return merged
+
+
+class RunBihamLevine(BihamLevine):
+    """BihamLevine en el que cada columna guarda las corridas de carros
+       verticales y cada fila las de carros horizontales. En una corrida
+       solo el carro del frente puede moverse, asi que cada medio paso
+       revisa una celda por corrida y solo cambia los extremos de las
+       corridas que avanzan, el costo depende del numero de grupos de carros
+       y no del numero de celdas. Las corridas se reconstruyen desde
+       self.matrix cuando el tablero se edita"""
+
+    def __init__(self, name, width, height, colors, filename=None):
+        super(RunBihamLevine, self).__init__(name, width, height, colors,
+                                             filename=filename)
+
+        self.events['mousebuttondown'].append(self.__edited)
+        self.columns = self.rows = None
+
+    def __edited(self, pos, _):
+        self.columns = self.rows = None
+
+    def clear(self, key):
+        super(RunBihamLevine, self).clear(key)
+        self.columns = self.rows = None
+
+    def putCars(self, vertical=0, horizontal=0, generator=None):
+        super(RunBihamLevine, self).putCars(vertical, horizontal, generator)
+        self.columns = self.rows = None
+
+    def buildRuns(self):
+        """construye las corridas de cada fila y columna desde self.matrix"""
+        self.columns = [getRuns([row[j] for row in self.matrix], 1)
+                        for j in range(self.width)]
+        self.rows = [getRuns(row, 2) for row in self.matrix]
+
+    def moveRuns(self, runs, index, vertical):
+        """avanza el carro del frente de cada corrida de la calle index si
+           la celda de adelante esta vacia, retorna (corridas, movidos)"""
+        matrix = self.matrix
+        size = self.height if vertical else self.width
+        pieces = []
+        moved = 0
+
+        for start, length in runs:
+            front = (start + length) % size
+            back = (start + length - 1) % size
+
+            if vertical:
+                if matrix[front][index]:
+                    pieces.append([start, length])
+                    continue
+                matrix[front][index] = 1
+                matrix[back][index] = 0
+            else:
+                if matrix[index][front]:
+                    pieces.append([start, length])
+                    continue
+                matrix[index][front] = 2
+                matrix[index][back] = 0
+
+            if length > 1:
+                pieces.append([start, length - 1])
+            pieces.append([front, 1])
+            moved += 1
+
+        if not moved:
+            return runs, 0
+        return mergeRuns(pieces, size), moved
+
+    def updateVertical(self):
+        if self.columns is None:
+            self.buildRuns()
+
+        moved = 0
+        for column, runs in enumerate(self.columns):
+            self.columns[column], count = self.moveRuns(runs, column, True)
+            moved += count
+
+        return moved
+
+    def updateHorizontal(self):
+        if self.rows is None:
+            self.buildRuns()
+
+        moved = 0
+        for row, runs in enumerate(self.rows):
+            self.rows[row], count = self.moveRuns(runs, row, False)
+            moved += count
+
+        return moved
+
+
+class EmptySlots(object):
+    """conjunto de las posiciones vacias de una calle, guardadas en una lista
+       con un diccionario posicion -> indice en la lista. Agregar, quitar y
+       obtener una posicion cualquiera cuesta O(1)"""
+
+    def __init__(self, positions):
+        self.positions = list(positions)
+        self.index = dict((position, k)
+                          for k, position in enumerate(self.positions))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def first(self):
+        return self.positions[0] if self.positions else None
+
+    def add(self, position):
+        self.index[position] = len(self.positions)
+        self.positions.append(position)
+
+    def remove(self, position):
+        # el ultimo elemento ocupa el lugar del que se quita
+        k = self.index.pop(position)
+        last = self.positions.pop()
+        if k < len(self.positions):
+            self.positions[k] = last
+            self.index[last] = k
+
+
+class IndexedBihamLevine(BihamLevine):
+    """BihamLevine que guarda las celdas vacias de cada fila y columna y las
+       actualiza en cada movimiento. La celda vacia desde la que empieza el
+       recorrido de una calle se obtiene en O(1) y las calles llenas se
+       saltan sin recorrerlas. El indice se reconstruye desde self.matrix
+       cuando el tablero se edita"""
+
+    def __init__(self, name, width, height, colors, filename=None):
+        super(IndexedBihamLevine, self).__init__(name, width, height, colors,
+                                                 filename=filename)
+
+        self.events['mousebuttondown'].append(self.__edited)
+        self.emptyRows = self.emptyColumns = None
+
+    def __edited(self, pos, _):
+        self.emptyRows = self.emptyColumns = None
+
+    def clear(self, key):
+        super(IndexedBihamLevine, self).clear(key)
+        self.emptyRows = self.emptyColumns = None
+
+    def putCars(self, vertical=0, horizontal=0, generator=None):
+        super(IndexedBihamLevine, self).putCars(vertical, horizontal,
+                                                generator)
+        self.emptyRows = self.emptyColumns = None
+
+    def buildIndex(self):
+        """construye el indice de celdas vacias desde self.matrix"""
+        self.emptyRows = [EmptySlots(j for j, value in enumerate(row)
+                                     if value == 0) for row in self.matrix]
+        self.emptyColumns = [EmptySlots(i for i, row in enumerate(self.matrix)
+                                        if row[j] == 0)
+                             for j in range(self.width)]
+
+    def findCeroFromColumn(self, column):
+        if self.emptyColumns is None:
+            self.buildIndex()
+        return self.emptyColumns[column].first()
+
+    def findCeroFromRow(self, row):
+        if self.emptyRows is None:
+            self.buildIndex()
+        return self.emptyRows[row].first()
+
+    def moveCar(self, row, column, newRow, newColumn):
+        super(IndexedBihamLevine, self).moveCar(row, column, newRow,
+                                                newColumn)
+
+        self.emptyRows[row].add(column)
+        self.emptyColumns[column].add(row)
+        self.emptyRows[newRow].remove(newColumn)
+        self.emptyColumns[newColumn].remove(newRow)
+
+
+ENGINES = {'python': BihamLevine, 'array': ArrayBihamLevine,
+           'runs': RunBihamLevine, 'indexed': IndexedBihamLevine}
 
 
 def validateColor(color):
@@ -169,6 +545,11 @@ Los colores disponibles son:
     parser.add_argument('-c2', '--car-color-type-two', type=parseColor,
                         metavar='{COLOR, "R G B"}', default='GREEN',
                         dest='color2', help='color del carro de tipo 2')
+    parser.add_argument('-s', '--seed', type=int, default=None,
+                        help='semilla para poner los carros al azar')
+    parser.add_argument('-e', '--engine', choices=sorted(ENGINES),
+                        default='python', help='''motor con el que se
+                        calcula cada paso''')
     parser.add_argument('-m', '--manual', action='store_true',
                         help='''si este argumento es pasado la simulaion se
                         debe actualizar manualment presionando la tecla
@@ -181,10 +562,11 @@ Los colores disponibles son:
 
     colors = {1: args.color1, 2: args.color2, 0: args.street_color}
 
-    bihamlevine = BihamLevine(args.name, args.width, args.height, colors,
-                              filename=args.filename)
-    bihamlevine.putCars(vertical=args.n1)
-    bihamlevine.putCars(horizontal=args.n2)
+    bihamlevine = ENGINES[args.engine](args.name, args.width, args.height,
+                                       colors, filename=args.filename)
+    generator = Random(args.seed)
+    bihamlevine.putCars(vertical=args.n1, generator=generator)
+    bihamlevine.putCars(horizontal=args.n2, generator=generator)
 
     graph = CellGraph(bihamlevine, cellwidth=args.cell_width, fps=args.fps,
                       cellheight=args.cell_height,
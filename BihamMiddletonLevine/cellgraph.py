@@ -1,6 +1,7 @@
 import pygame.locals as pl
 from os.path import exists
 import pygame as p
+import random
 
 
 _events = None
@@ -57,6 +58,22 @@ class System(object):
 
         return matrix
 
+    def getEmptyCells(self, number, empty=None, generator=None):
+        """retorna number posiciones (i, j) distintas elegidas al azar entre
+           las celdas vacias(iguales a empty, por defecto nullCell). El tablero
+           se recorre una sola vez, generator puede ser un random.Random con
+           semilla para que la simulacion sea reproducible"""
+        empty = self.nullCell if empty is None else empty
+        generator = generator or random
+
+        free = [(i, j) for i, row in enumerate(self.matrix)
+                for j, value in enumerate(row) if value == empty]
+
+        if number > len(free):
+            raise ValueError('there are only %s empty cells' % len(free))
+
+        return generator.sample(free, number)
+
     def getColor(self, i, j):
         return self.colors.get(self.matrix[i][j], 'BLACK')
 
@@ -120,6 +137,10 @@ class System(object):
         for function in self.events['mousemotion']:
             function(pos, event)
 
+    def close(self):
+        """se llama cuando termina la simulacion, los sistemas que usan
+           procesos o archivos los liberan aqui"""
+
     def update(self):
         """Se debe implementar en las clases que heredan"""
         pass
@@ -212,11 +233,20 @@ class CellGraph(object):
 
         clock = p.time.Clock()
 
-        quit = False
         self.pause = True
 
         self.reload(screen)
 
+        try:
+            self.loop(screen, clock, manual)
+        finally:
+            self.system.close()
+
+    def loop(self, screen, clock, manual):
+        """ciclo de eventos y actualizaciones hasta que se cierra la
+           ventana"""
+        quit = False
+
         while not quit and not manual:
             clock.tick(self.fps)
 
@@ -0,0 +1,194 @@
+"""Modelo Biham Middleton Levine en paralelo sobre memoria compartida.
+
+En el medio paso vertical cada columna se mueve sin depender de las demas y
+en el horizontal cada fila, asi que cada proceso se encarga de un bloque de
+columnas y de un bloque de filas. El tablero esta en memoria compartida y los
+carros se mueven en el mismo arreglo, una barrera entre medios pasos evita
+que un proceso empiece a mover filas mientras otro sigue moviendo columnas.
+Ejecutar este archivo mide la aceleracion segun el numero de procesos."""
+
+from argparse import ArgumentParser
+from biham_milddleton_levine import ArrayBihamLevine, moveCars
+from multiprocessing import Barrier, Process, RawArray, RawValue
+from random import Random
+from time import time
+import numpy as np
+
+
+def worker(buffer, shape, rows, columns, command, turn, control, step, moved,
+           index):
+    """ciclo de un proceso, espera en command el numero de medios pasos a
+       calcular(negativo para terminar) y los calcula sobre las filas
+       rows[0] hasta rows[1] - 1 y las columnas columns[0] hasta
+       columns[1] - 1. En moved deja los carros que movio en el ultimo medio
+       paso"""
+    board = np.frombuffer(buffer, dtype=np.uint8).reshape(shape)
+    vertical = board[:, columns[0]:columns[1]]
+    horizontal = board[rows[0]:rows[1]]
+
+    while True:
+        control.wait()
+        halfSteps = command.value
+        if halfSteps < 0:
+            break
+
+        current = turn.value
+        for halfStep in range(halfSteps):
+            current = (current + 1) % 2
+            if current:
+                count = np.count_nonzero(moveCars(vertical, 1, -2))
+            else:
+                count = np.count_nonzero(moveCars(horizontal, 2, -1))
+            step.wait()
+
+        moved[index] = count if halfSteps else 0
+        control.wait()
+
+
+class ParallelBihamLevine(ArrayBihamLevine):
+    """ArrayBihamLevine en el que cada medio paso se calcula con processes
+       procesos, self.matrix es una vista del tablero en memoria
+       compartida"""
+
+    def __init__(self, name, width, height, colors, filename=None,
+                 processes=2):
+        self.workers = []
+
+        super(ParallelBihamLevine, self).__init__(name, width, height,
+                                                  colors, filename=filename)
+
+        self.processes = max(1, min(processes, self.width, self.height))
+
+    def buildMatrix(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.uint8)
+
+        self.buffer = RawArray('B', matrix.shape[0] * matrix.shape[1])
+        board = np.frombuffer(self.buffer, dtype=np.uint8).reshape(
+            matrix.shape)
+        board[:] = matrix
+
+        return board
+
+    def emptyMatrix(self, width, height):
+        return self.buildMatrix(np.zeros((height, width), dtype=np.uint8))
+
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix[:] = 0
+
+    def start(self):
+        """reparte las filas y columnas entre los procesos y los inicia"""
+        rows = np.linspace(0, self.height, self.processes + 1).astype(int)
+        columns = np.linspace(0, self.width, self.processes + 1).astype(int)
+
+        self.command = RawValue('l', 0)
+        self.turnValue = RawValue('l', 0)
+        self.control = Barrier(self.processes + 1)
+        self.step = Barrier(self.processes)
+        self.movedByWorker = RawArray('q', self.processes)
+
+        for index in range(self.processes):
+            process = Process(target=worker, args=(
+                self.buffer, self.matrix.shape,
+                (rows[index], rows[index + 1]),
+                (columns[index], columns[index + 1]), self.command,
+                self.turnValue, self.control, self.step, self.movedByWorker,
+                index))
+            process.daemon = True
+            process.start()
+            self.workers.append(process)
+
+    def close(self):
+        """termina los procesos"""
+        if self.workers:
+            self.command.value = -1
+            self.control.wait()
+            for process in self.workers:
+                process.join()
+            self.workers = []
+
+    def advance(self, halfSteps):
+        """avanza halfSteps medios pasos alternando el turno, retorna los
+           carros que se movieron en el ultimo"""
+        if not self.workers:
+            self.start()
+
+        self.command.value = halfSteps
+        self.turnValue.value = self.turn
+        self.control.wait()
+        self.control.wait()
+
+        self.turn = (self.turn + halfSteps) % 2
+        self.moved = sum(self.movedByWorker)
+
+        return self.moved
+
+    def update(self):
+        self.advance(1)
+
+
+def benchmark(width, height, steps, processes, density=0.3, seed=0):
+    """mide el tiempo de steps pasos(dos medios pasos cada uno) con 1 hasta
+       processes procesos(en potencias de 2) y lo compara con
+       ArrayBihamLevine"""
+    cars = int(density * width * height) // 2
+
+    model = ArrayBihamLevine('array', width, height, {})
+    model.putCars(cars, cars, Random(seed))
+    board = model.matrix.copy()
+
+    start = time()
+    for halfStep in range(2 * steps):
+        model.update()
+    base = time() - start
+    print('array      %8.3fs' % base)
+
+    counts = []
+    count = 1
+    while count < processes:
+        counts.append(count)
+        count *= 2
+    counts.append(processes)
+
+    reference = None
+    for count in counts:
+        model = ParallelBihamLevine('parallel', width, height, {},
+                                    processes=count)
+        model.matrix[:] = board
+        model.start()
+
+        start = time()
+        model.advance(2 * steps)
+        elapsed = time() - start
+        model.close()
+
+        reference = reference or elapsed
+        print('%2d process %8.3fs speedup %5.2f (vs array %5.2f)' % (
+            count, elapsed, reference / elapsed, base / elapsed))
+
+
+def main():
+    parser = ArgumentParser(description='''mide la aceleracion del modelo
+                            Biham Middleton Levine en paralelo segun el
+                            numero de procesos''')
+
+    parser.add_argument('-w', '--width', type=int, default=2048,
+                        help='ancho de la calle')
+    parser.add_argument('-ht', '--height', type=int, default=2048,
+                        help='largo de la calle')
+    parser.add_argument('-g', '--steps', type=int, default=100,
+                        help='numero de pasos')
+    parser.add_argument('-d', '--density', type=float, default=0.3,
+                        help='fraccion de celdas ocupadas por carros')
+    parser.add_argument('-p', '--processes', type=int, default=4,
+                        help='numero maximo de procesos')
+
+    args = parser.parse_args()
+
+    benchmark(args.width, args.height, args.steps, args.processes,
+              args.density)
+
+
+if __name__ == '__main__':
+    main()
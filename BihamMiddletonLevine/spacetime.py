@@ -0,0 +1,140 @@
+"""Grabacion del diagrama espacio-tiempo de una simulacion en un archivo
+binario mapeado en memoria.
+
+El archivo tiene una cabecera de 128 bytes(ver HEADER) seguida de los cuadros
+de la simulacion uno detras de otro, todos de la misma forma y tipo. El
+archivo se reserva completo al crearlo y los cuadros se escriben en una
+ventana mapeada en memoria de unos WINDOW bytes que avanza por el archivo, asi
+la memoria usada no depende del numero de pasos. Al leerlo se obtiene un
+np.memmap de forma (pasos, ...) sin cargar nada."""
+
+from argparse import ArgumentParser
+import numpy as np
+import struct
+
+
+MAGIC = b'SPACETIM'
+VERSION = 1
+# magic, version, numero de dimensiones, tipo(np.dtype.str), capacidad,
+# cuadros escritos y hasta 4 dimensiones del cuadro
+HEADER = struct.Struct('<8sII8sQQ4Q')
+HEADERSIZE = 128
+WINDOW = 1 << 24
+
+
+class SpaceTimeWriter(object):
+    """escribe hasta steps cuadros de forma shape y tipo dtype en
+       filename"""
+
+    def __init__(self, filename, shape, steps, dtype=np.int8):
+        self.filename = filename
+        self.shape = tuple(shape)
+        self.steps = steps
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+
+        if len(self.shape) > 4:
+            raise ValueError('frames can have at most 4 dimensions')
+
+        self.frameSize = self.dtype.itemsize * int(np.prod(self.shape))
+        self.window = max(1, WINDOW // max(self.frameSize, 1))
+        self.frames = None
+        self.first = 0
+
+        with open(filename, 'wb') as fichero:
+            fichero.write(self.getHeader())
+            fichero.truncate(HEADERSIZE + steps * self.frameSize)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def getHeader(self):
+        dimensions = self.shape + (0,) * (4 - len(self.shape))
+        header = HEADER.pack(MAGIC, VERSION, len(self.shape),
+                             self.dtype.str.encode(), self.steps, self.count,
+                             *dimensions)
+
+        return header + b'\0' * (HEADERSIZE - len(header))
+
+    def mapWindow(self):
+        """mapea la ventana de cuadros que empieza en el cuadro count"""
+        if self.frames is not None:
+            self.frames.flush()
+
+        self.first = self.count
+        self.frames = np.memmap(self.filename, dtype=self.dtype, mode='r+',
+                                offset=HEADERSIZE +
+                                self.first * self.frameSize,
+                                shape=(min(self.window, self.steps -
+                                           self.first),) + self.shape)
+
+    def write(self, frame):
+        if self.count >= self.steps:
+            raise ValueError('the file only has room for %s frames' %
+                             self.steps)
+
+        if self.frames is None or self.count - self.first >= len(self.frames):
+            self.mapWindow()
+
+        self.frames[self.count - self.first] = frame
+        self.count += 1
+
+    def close(self):
+        """guarda los cuadros y el numero de cuadros escritos"""
+        if self.frames is not None:
+            self.frames.flush()
+            self.frames = None
+
+        with open(self.filename, 'r+b') as fichero:
+            fichero.write(self.getHeader())
+
+
+def readSpaceTime(filename):
+    """retorna un np.memmap de solo lectura con los cuadros escritos"""
+    with open(filename, 'rb') as fichero:
+        header = HEADER.unpack(fichero.read(HEADER.size))
+
+    magic, version, ndim, dtype, steps, count = header[:6]
+    if magic != MAGIC:
+        raise ValueError('%s is not a space-time file' % filename)
+
+    shape = (count,) + tuple(header[6:6 + ndim])
+    return np.memmap(filename, dtype=np.dtype(dtype.rstrip(b'\0').decode()),
+                     mode='r', offset=HEADERSIZE, shape=shape)
+
+
+def record(system, filename, steps):
+    """graba el cuadro inicial de system(system.getFrame()) y el de cada uno
+       de steps llamados a system.update()"""
+    frame = system.getFrame()
+
+    with SpaceTimeWriter(filename, frame.shape, steps + 1,
+                         frame.dtype) as writer:
+        writer.write(frame)
+        for step in range(steps):
+            system.update()
+            writer.write(system.getFrame())
+
+
+def main():
+    parser = ArgumentParser(description='''muestra la forma y la ocupacion de
+                            un archivo espacio-tiempo''')
+    parser.add_argument('filename', help='archivo espacio-tiempo')
+
+    args = parser.parse_args()
+
+    frames = readSpaceTime(args.filename)
+    print('frames: %s shape: %s dtype: %s' % (frames.shape[0],
+                                              frames.shape[1:],
+                                              frames.dtype))
+    if len(frames):
+        empty = -1 if frames.dtype.kind == 'i' else 0
+        print('occupancy first: %.4f last: %.4f' % (
+            np.mean(frames[0] != empty), np.mean(frames[-1] != empty)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Barrido de densidades del modelo Biham Middleton Levine sin ventana.
+
+Cada corrida pone carros al azar con una densidad, un tamano de tablero y una
+semilla, y registra la velocidad promedio(carros que se mueven sobre el total)
+de cada paso completo(medio paso vertical y medio paso horizontal). La corrida
+termina antes de tiempo si se detecta:
+
+    - jam: ningun carro se movio en un paso, el tablero ya no cambia.
+    - free: todos los carros se movieron durante patience pasos seguidos.
+    - cycle: el tablero volvio a uno de los ultimos historySize estados, la
+      velocidad es el promedio sobre el ciclo. Los estados se guardan
+      completos(un byte por celda), por lo que ocupan historySize tableros.
+
+Una corrida sin carros no se simula, su estado es empty y su velocidad 1(el
+limite del flujo libre).
+
+Las corridas se reparten en un pool de procesos y el resultado se escribe en
+un archivo csv con una fila por corrida."""
+
+from argparse import ArgumentParser
+from biham_milddleton_levine import ENGINES
+from collections import OrderedDict
+from multiprocessing import Pool
+from random import Random
+import numpy as np
+import csv
+
+
+FIELDS = ['width', 'height', 'density', 'seed', 'cars', 'steps', 'status',
+          'period', 'velocity']
+
+
+def parseSize(string):
+    """convierte 'WxH' en (W, H)"""
+    width, height = string.lower().split('x')
+    return int(width), int(height)
+
+
+def getState(matrix):
+    """retorna los bytes del tablero, se guardan completos para que un
+       choque de hashes no se tome como un ciclo"""
+    return np.asarray(matrix, dtype=np.uint8).tobytes()
+
+
+def simulate(task):
+    """hace una corrida, task es (width, height, density, seed, steps,
+       fraction, patience, engine, historySize) con fraction la fraccion de
+       carros verticales. Retorna (fila del resultado, velocidades por
+       paso)"""
+    (width, height, density, seed, steps, fraction, patience, engine,
+     historySize) = task
+
+    cars = int(round(density * width * height))
+    if cars == 0:
+        return [width, height, density, seed, cars, 0, 'empty', 0, 1.0], []
+
+    vertical = int(round(fraction * cars))
+    board = ENGINES[engine]('sweep', width, height, {})
+    board.putCars(vertical, cars - vertical, Random(seed))
+
+    velocities = []
+    seen = OrderedDict([(getState(board.matrix), 0)])
+    status, period, free = 'steps', 0, 0
+
+    for step in range(1, steps + 1):
+        moved = board.updateVertical() + board.updateHorizontal()
+        velocities.append(moved / float(cars))
+
+        if moved == 0:
+            status = 'jam'
+            break
+
+        free = free + 1 if moved == cars else 0
+        if free >= patience:
+            status = 'free'
+            break
+
+        state = getState(board.matrix)
+        if state in seen:
+            status, period = 'cycle', step - seen[state]
+            break
+        seen[state] = step
+        if len(seen) > historySize:
+            seen.popitem(last=False)
+
+    if status == 'cycle':
+        velocity = float(np.mean(velocities[-period:]))
+    elif status == 'steps':
+        velocity = float(np.mean(velocities[len(velocities) // 2:]))
+    else:
+        velocity = float(velocities[-1])
+
+    row = [width, height, density, seed, cars, len(velocities), status,
+           period, velocity]
+
+    return row, velocities
+
+
+def sweep(sizes, densities, seeds, steps, fraction=0.5, patience=None,
+          engine='array', processes=None, output='sweep.csv', series=None,
+          historySize=1000):
+    """hace todas las combinaciones de sizes, densities y seeds(semillas de
+       0 a seeds - 1) en processes procesos. patience por defecto es el
+       lado mayor del tablero. Si series no es None guarda ahi la velocidad
+       de cada paso de cada corrida"""
+    tasks = [(width, height, density, seed, steps, fraction,
+              patience or max(width, height), engine, historySize)
+             for width, height in sizes for density in densities
+             for seed in range(seeds)]
+
+    pool = Pool(processes)
+    try:
+        results = pool.map(simulate, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    with open(output, 'w') as fichero:
+        writer = csv.writer(fichero)
+        writer.writerow(FIELDS)
+        for row, velocities in results:
+            writer.writerow(row)
+
+    if series:
+        with open(series, 'w') as fichero:
+            writer = csv.writer(fichero)
+            writer.writerow(['run', 'step', 'velocity'])
+            for run, (row, velocities) in enumerate(results):
+                for step, velocity in enumerate(velocities, 1):
+                    writer.writerow([run, step, velocity])
+
+    return [row for row, velocities in results]
+
+
+def main():
+    parser = ArgumentParser(description='''barrido de densidades del modelo
+                            Biham Middleton Levine, escribe la velocidad
+                            promedio de cada corrida en un archivo csv''')
+
+    parser.add_argument('-sz', '--sizes', type=parseSize, nargs='+',
+                        default=[(64, 64)], metavar='WxH',
+                        help='tamanos del tablero')
+    parser.add_argument('-d', '--densities', type=float, nargs='+',
+                        default=[0.2, 0.3, 0.35, 0.4, 0.5],
+                        help='fracciones de celdas ocupadas por carros')
+    parser.add_argument('-n', '--seeds', type=int, default=4,
+                        help='numero de semillas por combinacion')
+    parser.add_argument('-g', '--steps', type=int, default=10000,
+                        help='numero maximo de pasos por corrida')
+    parser.add_argument('-fr', '--fraction', type=float, default=0.5,
+                        help='fraccion de carros verticales')
+    parser.add_argument('-pa', '--patience', type=int, default=None,
+                        help='''pasos seguidos en los que se mueven todos los
+                        carros para terminar como flujo libre(por defecto el
+                        lado mayor del tablero)''')
+    parser.add_argument('-e', '--engine', choices=sorted(ENGINES),
+                        default='array', help='''motor con el que se calcula
+                        cada paso''')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='numero de procesos(por defecto uno por nucleo)')
+    parser.add_argument('-o', '--output', default='sweep.csv',
+                        help='archivo csv con una fila por corrida')
+    parser.add_argument('-se', '--series', default=None,
+                        help='''archivo csv con la velocidad de cada paso de
+                        cada corrida''')
+    parser.add_argument('-hs', '--history-size', type=int, default=1000,
+                        help='''numero de estados que se guardan para
+                        detectar ciclos''')
+
+    args = parser.parse_args()
+
+    sweep(args.sizes, args.densities, args.seeds, args.steps, args.fraction,
+          args.patience, args.engine, args.processes, args.output,
+          args.series, args.history_size)
+
+
+if __name__ == '__main__':
+    main()
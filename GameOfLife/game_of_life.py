@@ -1,53 +1,284 @@
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 from cellgraph import System, CellGraph, COLORS
-from random import randint
+from hashlife import HashLife
+from collections import Counter, OrderedDict
+from itertools import groupby
+from multiprocessing import Barrier, Process, RawArray, RawValue
+from random import Random
+import numpy as np
+import patterns
+
+
+MASK64 = (1 << 64) - 1
+
+# numero de bits encendidos de cada byte, para numpy sin np.bitwise_count
+POPCOUNT = np.array([bin(k).count('1') for k in range(256)], dtype=np.uint8)
+
+
+def zobrist(i, j):
+    """clave pseudoaleatoria de 64 bits de la celda i, j(splitmix64 de las
+       coordenadas), el hash del tablero es el xor de las claves de las
+       celulas vivas"""
+    z = ((((i & 0xFFFFFFFF) << 32) | (j & 0xFFFFFFFF)) +
+         0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def mix(z):
+    """splitmix64 de un arreglo de uint64, lo modifica en su lugar"""
+    z += np.uint64(0x9E3779B97F4A7C15)
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+
+    return z
+
+
+def getKeys(rows, columns):
+    """claves(ver zobrist) de las celdas en los arreglos rows, columns"""
+    low = np.uint64(0xFFFFFFFF)
+    z = (np.asarray(rows, dtype=np.int64).astype(np.uint64) & low) << \
+        np.uint64(32)
+    z |= np.asarray(columns, dtype=np.int64).astype(np.uint64) & low
+
+    return mix(z)
+
+
+def zobristXor(rows, columns, chunk=1 << 18):
+    """xor de las claves de las celdas en los arreglos rows, columns, se
+       calcula por bloques de chunk celdas para acotar la memoria"""
+    rows, columns = np.asarray(rows), np.asarray(columns)
+    value = 0
+
+    for start in range(0, rows.size, chunk):
+        keys = getKeys(rows[start:start + chunk], columns[start:start + chunk])
+        value ^= int(np.bitwise_xor.reduce(keys))
+
+    return value
+
+
+def wordXor(rows, columns, words):
+    """xor de las claves de las palabras de 64 bits words en la fila rows y
+       la posicion columns, la clave depende del valor de la palabra y es 0
+       si la palabra es 0"""
+    keys = getKeys(rows, columns)
+    keys ^= np.asarray(words, dtype=np.uint64)
+    keys = mix(keys)
+    keys[np.asarray(words) == 0] = 0
+
+    return int(np.bitwise_xor.reduce(keys)) if keys.size else 0
+
+
+def popcount(words):
+    """retorna el numero de bits encendidos de cada palabra de 64 bits"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    return POPCOUNT[words.view(np.uint8)].reshape(words.shape + (8,)).sum(-1)
+
+
+def findRuns(bits, top=0):
+    """genera las corridas (fila, columna, largo) de unos de un arreglo de
+       numpy de 0 y 1, top se suma a las filas"""
+    padded = np.zeros((bits.shape[0], bits.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = bits != 0
+    steps = np.diff(padded, axis=1)
+
+    rows, starts = np.nonzero(steps == 1)
+    ends = np.nonzero(steps == -1)[1]
+
+    for i, j, end in zip(rows.tolist(), starts.tolist(), ends.tolist()):
+        yield top + i, j, end - j
 
 
 class GameOfLife(System):
-    """docstring for GameOfLife"""
+    """juego de la vida en un toro. Si historySize es mayor que cero se
+       detectan ciclos: el tablero mantiene un hash(ver zobrist) que se
+       actualiza solo con las celulas que cambian, y un historial acotado de
+       los ultimos historySize hashes con el que se detecta cuando el tablero
+       se repite, en ese caso self.cycle es la tupla (transitorio, periodo).
+       Con historySize 0(por defecto) no se calcula el hash"""
 
-    def __init__(self, name, width, height, colors, filename=None):
+    rule = 'B3/S23'
+
+    def __init__(self, name, width, height, colors, filename=None,
+                 historySize=0):
         if filename:
-            matrix = self.getMatrixFromFile(filename)
+            matrix = self.buildMatrix(self.getMatrixFromFile(filename))
         else:
-            matrix = [[0] * width for i in range(height)]
+            matrix = self.emptyMatrix(width, height)
 
         super(GameOfLife, self).__init__(matrix, colors, name=name, add=False,
                                          possibleValues=[0, 1])
 
         self.events['mousebuttondown'].append(self.__mouseButtonDown)
         self.events['mousemotion'].append(self.__mouseMotion)
+        self.events['keydown'].append(self.__exportPattern)
         self.alives = 0
 
+        self.historySize = historySize
+        self.stopOnCycle = False
+        self.resetHash()
+
     def __mouseButtonDown(self, pos, _):
         value = super(GameOfLife, self).add(pos, _)
 
-        if value:
+        if value is None:
+            return
+
+        # los motores con numpy retornan np.uint8, con el que self.alives
+        # dejaria de ser un int y daria la vuelta en 255
+        if int(value):
             self.alives += 1
         else:
             self.alives -= 1
+        self.cellChanged(pos[1], pos[0])
 
     def __mouseMotion(self, pos, event):
         if event.buttons[0]:
             value = super(GameOfLife, self).add(pos, event, 1)
-            self.alives += int(not value)
+            if value == 0:
+                self.alives += 1
+                self.cellChanged(pos[1], pos[0])
         if event.buttons[2]:
             value = super(GameOfLife, self).add(pos, event, 0)
-            self.alives -= value
+            if value == 1:
+                self.alives -= 1
+                self.cellChanged(pos[1], pos[0])
+
+    def __exportPattern(self, key):
+        if key == 'r':
+            self.exportPattern(self.getName('rle'))
+            print('Pattern saved')
 
     def getCaption(self):
-        return 'Alives: %s' % self.alives
+        caption = 'Alives: %s' % self.alives
+        if self.cycle:
+            caption += ' Transient: %s Period: %s' % self.cycle
+        return caption
+
+    def buildMatrix(self, matrix):
+        """convierte la lista de listas a la representacion del tablero que
+           usa el motor"""
+        return matrix
+
+    def emptyMatrix(self, width, height):
+        """retorna un tablero vacio en la representacion del motor"""
+        return [[0] * width for i in range(height)]
 
-    def putCellsAlives(self, alives):
-        ready = alives
-        self.alives = alives
-        while ready != 0:
-            i = randint(0, self.height - 1)
-            j = randint(0, self.width - 1)
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix = self.emptyMatrix(self.width, self.height)
+            self.alives = 0
+            self.resetHash()
 
-            if not self.matrix[i][j]:
-                self.matrix[i][j] = 1
-                ready -= 1
+    def setRun(self, i, j, length):
+        """pone vivas las celulas de la fila i desde la columna j hasta la
+           j + length - 1, lo que queda por fuera del tablero se ignora"""
+        if 0 <= i < self.height:
+            end = min(j + length, self.width)
+            self.matrix[i][j:end] = [1] * (end - j)
+
+    def boardChanged(self):
+        """se llama despues de escribir en el tablero con setRun"""
+        self.alives = int(self.countAlives())
+        self.resetHash()
+
+    def countAlives(self):
+        return sum(1 for row in self.matrix for value in row if value)
+
+    def loadPattern(self, filename):
+        """reemplaza el tablero por un patron RLE o Life 1.06, con su esquina
+           superior izquierda en la esquina del tablero"""
+        self.clear('c')
+
+        for i, j, length in patterns.readRuns(filename):
+            self.setRun(i, j, length)
+
+        self.boardChanged()
+
+    def getRuns(self):
+        """genera las corridas (fila, columna, largo) de celulas vivas"""
+        for i, row in enumerate(self.matrix):
+            j = 0
+            for alive, group in groupby(row):
+                length = sum(1 for cell in group)
+                if alive:
+                    yield i, j, length
+                j += length
+
+    def exportPattern(self, filename):
+        """guarda el tablero como patron RLE o Life 1.06 segun la extension
+           de filename"""
+        patterns.write(filename, self.getRuns(), self.width, self.height,
+                       self.rule)
+
+    def putCellsAlives(self, alives, generator=None):
+        for i, j in self.getEmptyCells(alives, generator=generator):
+            self.matrix[i][j] = 1
+        self.alives += alives
+
+        self.resetHash()
+
+    def computeHash(self):
+        """calcula el hash del tablero desde cero"""
+        value = 0
+        for i, row in enumerate(self.matrix):
+            for j, alive in enumerate(row):
+                if alive:
+                    value ^= zobrist(i, j)
+        return value
+
+    def resetHash(self):
+        """recalcula el hash y empieza un historial nuevo"""
+        self.hash = self.computeHash() if self.historySize else 0
+        self.generation = 0
+        self.resetHistory()
+
+    def resetHistory(self):
+        self.history = OrderedDict([(self.hash, self.generation)])
+        self.cycle = None
+
+    def cellChanged(self, i, j):
+        """se llama cuando el usuario cambia la celda i, j, el historial
+           anterior deja de ser valido"""
+        if self.historySize:
+            self.hash ^= zobrist(i, j)
+        self.resetHistory()
+
+    def registerGeneration(self):
+        """agrega el hash actual al historial, si ya estaba el tablero se
+           repitio y se guarda el transitorio y el periodo"""
+        self.generation += 1
+        if not self.historySize:
+            return
+
+        first = self.history.get(self.hash)
+        if first is not None:
+            if self.cycle is None:
+                self.cycle = (first, self.generation - first)
+                print('Cycle detected: transient %s, period %s' % self.cycle)
+            return
+
+        self.history[self.hash] = self.generation
+        if len(self.history) > self.historySize:
+            self.history.popitem(last=False)
+
+    def run(self, generations):
+        """simula sin interfaz grafica hasta generations generaciones o hasta
+           que el tablero se repita(si se detectan ciclos), retorna
+           self.cycle"""
+        for generation in range(generations):
+            self.nextGeneration()
+            self.registerGeneration()
+            if self.cycle:
+                break
+
+        return self.cycle
 
     def countAliveNeighbor(self, i, j):
         alives = 0
@@ -71,7 +302,10 @@ class GameOfLife(System):
 
         return alives
 
-    def update(self):
+    def nextGeneration(self):
+        """calcula la siguiente generacion, las clases que heredan la
+           reimplementan manteniendo self.alives y self.hash(solo si
+           historySize es mayor que cero)"""
         copy = [[0] * self.width for i in range(self.height)]
         self.alives = 0
 
@@ -86,8 +320,808 @@ class GameOfLife(System):
                     copy[i][j] = 1
                     self.alives += 1
 
+                if self.historySize and copy[i][j] != self.matrix[i][j]:
+                    self.hash ^= zobrist(i, j)
+
         self.matrix = copy
 
+    def update(self):
+        if self.cycle and self.stopOnCycle:
+            return
+
+        self.nextGeneration()
+        self.registerGeneration()
+
+
+class NumpyGameOfLife(GameOfLife):
+    """GameOfLife sobre un arreglo de numpy, el numero de vecinos de todo el
+       tablero se calcula con vistas desplazadas(np.roll) que respetan la
+       topologia de toro, y la regla B3/S23 se aplica como mascaras
+       booleanas en una sola pasada"""
+
+    def buildMatrix(self, matrix):
+        return np.array(matrix, dtype=np.uint8)
+
+    def emptyMatrix(self, width, height):
+        return np.zeros((height, width), dtype=np.uint8)
+
+    def setRun(self, i, j, length):
+        if 0 <= i < self.height:
+            self.matrix[i, j:j + length] = 1
+
+    def countAlives(self):
+        return int(np.count_nonzero(self.matrix))
+
+    def getEmptyCells(self, number, empty=None, generator=None):
+        """igual que System.getEmptyCells(mismas celdas para la misma
+           semilla) sin recorrer el tablero en python. Las celdas vacias se
+           cuentan por fila y solo se buscan en las filas elegidas"""
+        empty = self.nullCell if empty is None else empty
+        free = self.matrix == empty
+        counts = np.count_nonzero(free, axis=1)
+        ends = np.cumsum(counts)
+
+        if number > ends[-1]:
+            raise ValueError('there are only %s empty cells' % ends[-1])
+
+        chosen = np.array((generator or Random()).sample(range(ends[-1]),
+                                                         number),
+                          dtype=np.int64)
+        rows = np.searchsorted(ends, chosen, side='right')
+        ranks = chosen - (ends[rows] - counts[rows])
+
+        columns = np.empty_like(ranks)
+        order = np.argsort(rows, kind='stable')
+        bounds = np.flatnonzero(np.diff(rows[order])) + 1
+        for group in np.split(order, bounds):
+            if len(group):
+                columns[group] = np.flatnonzero(free[rows[group[0]]])[
+                    ranks[group]]
+
+        return list(zip(rows.tolist(), columns.tolist()))
+
+    def getRuns(self):
+        return findRuns(self.matrix)
+
+    def computeHash(self):
+        return zobristXor(*np.nonzero(self.matrix))
+
+    def countNeighbors(self):
+        """retorna una matrix con el numero de vecinos vivos de cada celda"""
+        vertical = (self.matrix + np.roll(self.matrix, 1, 0) +
+                    np.roll(self.matrix, -1, 0))
+
+        return (vertical + np.roll(vertical, 1, 1) + np.roll(vertical, -1, 1) -
+                self.matrix)
+
+    def nextGeneration(self):
+        neighbors = self.countNeighbors()
+
+        alive = (neighbors == 3) | ((self.matrix == 1) & (neighbors == 2))
+
+        if self.historySize:
+            self.hash ^= zobristXor(*np.nonzero(alive != self.matrix))
+        self.matrix = alive.view(np.uint8)
+        self.alives = int(np.count_nonzero(alive))
+
+
+def parseRule(string):
+    """convierte un rulestring de la forma B36/S23(o la notacion S/B 23/36)
+       en la tupla (nacimientos, supervivencias) con los numeros de vecinos
+       vivos de cada caso"""
+    parts = string.upper().replace(' ', '').split('/')
+
+    if len(parts) != 2:
+        raise ValueError('invalid rule %r' % string)
+
+    if parts[0].startswith('S') or parts[1].startswith('B'):
+        parts.reverse()
+    elif not parts[0].startswith('B'):
+        # notacion S/B sin letras
+        parts = ['B' + parts[1], 'S' + parts[0]]
+
+    birth, survive = parts
+    if not (birth.startswith('B') and survive.startswith('S')):
+        raise ValueError('invalid rule %r' % string)
+
+    birth, survive = birth[1:], survive[1:]
+    if any(digit not in '012345678' for digit in birth + survive):
+        raise ValueError('invalid rule %r' % string)
+
+    return tuple(map(int, birth)), tuple(map(int, survive))
+
+
+class RuleGameOfLife(NumpyGameOfLife):
+    """automata celular tipo vida con cualquier regla outer-totalistic
+       B/S. La regla se compila en una tabla indexada por 2 * vecinos + estado
+       de la celula, y cada generacion es una sola consulta a la tabla para
+       todo el tablero"""
+
+    def __init__(self, name, width, height, colors, filename=None,
+                 rule='B3/S23', historySize=0):
+        super(RuleGameOfLife, self).__init__(name, width, height, colors,
+                                             filename=filename,
+                                             historySize=historySize)
+
+        self.setRule(rule)
+
+    def setRule(self, rule):
+        if isinstance(rule, str):
+            rule = parseRule(rule)
+
+        birth, survive = rule
+        self.rule = 'B%s/S%s' % (''.join(map(str, sorted(set(birth)))),
+                                 ''.join(map(str, sorted(set(survive)))))
+
+        self.table = np.zeros(18, dtype=np.uint8)
+        for alives in birth:
+            self.table[2 * alives] = 1
+        for alives in survive:
+            self.table[2 * alives + 1] = 1
+
+    def getCaption(self):
+        caption = super(RuleGameOfLife, self).getCaption()
+        return caption + ' Rule: ' + self.rule
+
+    def nextGeneration(self):
+        index = self.countNeighbors() * 2 + self.matrix
+
+        matrix = self.table[index]
+
+        if self.historySize:
+            self.hash ^= zobristXor(*np.nonzero(matrix != self.matrix))
+        self.matrix = matrix
+        self.alives = int(np.count_nonzero(matrix))
+
+
+class ActiveGameOfLife(GameOfLife):
+    """GameOfLife que solo evalua las celulas que cambiaron en la ultima
+       generacion y sus vecinas, el resto del tablero no puede cambiar. El
+       numero de celulas vivas se mantiene de forma incremental"""
+
+    def __init__(self, name, width, height, colors, filename=None,
+                 historySize=0):
+        super(ActiveGameOfLife, self).__init__(name, width, height, colors,
+                                               filename=filename,
+                                               historySize=historySize)
+
+        self.alives = self.countAlives()
+        self.markAllChanged()
+
+    def cellChanged(self, i, j):
+        super(ActiveGameOfLife, self).cellChanged(i, j)
+        self.changed.add((i, j))
+
+    def markAllChanged(self):
+        self.changed = set((i, j) for i in range(self.height)
+                           for j in range(self.width))
+
+    def clear(self, key):
+        """limpia el tablero"""
+        super(ActiveGameOfLife, self).clear(key)
+        if key == 'c':
+            self.changed = set()
+
+    def putCellsAlives(self, alives, generator=None):
+        super(ActiveGameOfLife, self).putCellsAlives(alives, generator)
+        self.alives = self.countAlives()
+        self.markAllChanged()
+
+    def boardChanged(self):
+        super(ActiveGameOfLife, self).boardChanged()
+        self.markAllChanged()
+
+    def getCandidates(self):
+        """retorna las celulas que cambiaron y sus vecinas"""
+        candidates = set()
+
+        for i, j in self.changed:
+            for r in (i - 1, i, i + 1):
+                r %= self.height
+                for c in (j - 1, j, j + 1):
+                    candidates.add((r, c % self.width))
+
+        return candidates
+
+    def nextGeneration(self):
+        changed = set()
+
+        for i, j in self.getCandidates():
+            alives = self.countAliveNeighbor(i, j)
+            alive = alives == 3 or (alives == 2 and self.matrix[i][j])
+
+            if alive != bool(self.matrix[i][j]):
+                changed.add((i, j))
+
+        for i, j in changed:
+            self.matrix[i][j] = 1 - self.matrix[i][j]
+            self.alives += 1 if int(self.matrix[i][j]) else -1
+            if self.historySize:
+                self.hash ^= zobrist(i, j)
+
+        self.changed = changed
+
+
+class BitRow(object):
+    """fila de una BitMatrix, se comporta como una lista de 0 y 1"""
+
+    def __init__(self, words, width):
+        self.words = words
+        self.width = width
+
+    def __len__(self):
+        return self.width
+
+    def __getitem__(self, j):
+        return int(self.words[j >> 6] >> np.uint64(j & 63)) & 1
+
+    def __setitem__(self, j, value):
+        bit = np.uint64(1) << np.uint64(j & 63)
+        if value:
+            self.words[j >> 6] |= bit
+        else:
+            self.words[j >> 6] &= ~bit
+
+    def __iter__(self):
+        for j in range(self.width):
+            yield self[j]
+
+
+class BitMatrix(object):
+    """matrix de 0 y 1 en la que cada fila se guarda empaquetada en palabras
+       de 64 bits, el bit j de la fila esta en el bit j % 64 de la palabra
+       j // 64. Se puede indexar como la lista de listas de System"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.words = np.zeros((height, (width + 63) // 64), dtype=np.uint64)
+
+    @classmethod
+    def fromMatrix(cls, matrix):
+        """construye la BitMatrix a partir de una lista de listas"""
+        bits = np.array(matrix, dtype=np.uint8)
+        height, width = bits.shape
+
+        output = cls(width, height)
+        padded = np.zeros((height, output.words.shape[1] * 64), np.uint8)
+        padded[:, :width] = bits
+        packed = np.packbits(padded, axis=1, bitorder='little')
+        output.words[:] = packed.view('<u8')
+
+        return output
+
+    def tolist(self):
+        """retorna la matrix como una lista de listas"""
+        packed = self.words.astype('<u8').view(np.uint8)
+        bits = np.unpackbits(packed, axis=1, bitorder='little')
+
+        return bits[:, :self.width].tolist()
+
+    def getBits(self, top=0, bottom=None):
+        """retorna las filas top hasta bottom - 1 como un arreglo de 0 y 1"""
+        packed = self.words[top:bottom].astype('<u8').view(np.uint8)
+        bits = np.unpackbits(packed, axis=1, bitorder='little')
+
+        return bits[:, :self.width]
+
+    def nonzero(self, words=None):
+        """retorna las filas y columnas de los bits encendidos de words(por
+           defecto los de la matrix), solo se desempaquetan las palabras que
+           no son cero"""
+        words = self.words if words is None else words
+        rows, columns = np.nonzero(words)
+
+        packed = words[rows, columns].astype('<u8').view(np.uint8)
+        bits = np.unpackbits(packed.reshape(-1, 8), axis=1,
+                             bitorder='little')
+        index, offset = np.nonzero(bits)
+
+        return rows[index], columns[index] * 64 + offset
+
+    def selectZeros(self, ranks):
+        """retorna las filas y columnas de los bits apagados numero ranks(0
+           es el primero recorriendo la matrix por filas), se cuentan por
+           palabra y solo se desempaquetan las palabras de esos bits"""
+        ranks = np.asarray(ranks, dtype=np.int64)
+        perRow = self.words.shape[1]
+        words = self.words.reshape(-1)
+
+        # los bits de relleno de la ultima palabra de cada fila no cuentan
+        zeros = 64 - popcount(words).astype(np.int64)
+        zeros.reshape(self.height, perRow)[:, -1] -= perRow * 64 - self.width
+        ends = np.cumsum(zeros)
+
+        index = np.searchsorted(ends, ranks, side='right')
+        ranks = ranks - (ends[index] - zeros[index])
+
+        packed = (~words[index]).astype('<u8').view(np.uint8)
+        bits = np.unpackbits(packed.reshape(-1, 8), axis=1,
+                             bitorder='little')
+        offset = np.argmax(np.cumsum(bits, axis=1) > ranks[:, np.newaxis],
+                           axis=1)
+
+        return index // perRow, index % perRow * 64 + offset
+
+    def setRun(self, i, start, end):
+        """enciende los bits start hasta end - 1 de la fila i"""
+        row = self.words[i]
+
+        while start < end:
+            bit = start & 63
+            count = min(64 - bit, end - start)
+            row[start >> 6] |= np.uint64(((1 << count) - 1) << bit)
+            start += count
+
+    def count(self):
+        """retorna el numero de bits encendidos, contando por palabra sin
+           desempaquetar el tablero"""
+        return int(popcount(self.words).sum())
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, i):
+        return BitRow(self.words[i], self.width)
+
+    def __iter__(self):
+        for i in range(self.height):
+            yield self[i]
+
+
+class BitGameOfLife(GameOfLife):
+    """GameOfLife con el tablero empaquetado en bits(ver BitMatrix), la
+       siguiente generacion se calcula con sumadores completos sobre las
+       palabras, es decir 64 celulas a la vez. El hash es el xor de las
+       claves de las palabras no nulas(ver wordXor), asi se actualiza sin
+       desempaquetar las celdas que cambian"""
+
+    def __init__(self, name, width, height, colors, filename=None,
+                 historySize=0):
+        super(BitGameOfLife, self).__init__(name, width, height, colors,
+                                            filename=filename,
+                                            historySize=historySize)
+
+        self.alives = self.matrix.count()
+
+        last = (self.width - 1) % 64
+        self.lastBit = np.uint64(last)
+        self.lastMask = np.uint64((1 << (last + 1)) - 1)
+
+    def buildMatrix(self, matrix):
+        return BitMatrix.fromMatrix(matrix)
+
+    def emptyMatrix(self, width, height):
+        return BitMatrix(width, height)
+
+    def setRun(self, i, j, length):
+        if 0 <= i < self.height:
+            self.matrix.setRun(i, j, min(j + length, self.width))
+
+    def countAlives(self):
+        return self.matrix.count()
+
+    def getEmptyCells(self, number, empty=None, generator=None):
+        """igual que System.getEmptyCells(mismas celdas para la misma
+           semilla) sin desempaquetar el tablero(ver BitMatrix.selectZeros)"""
+        if empty not in (None, 0):
+            return super(BitGameOfLife, self).getEmptyCells(number, empty,
+                                                            generator)
+
+        free = self.width * self.height - self.matrix.count()
+        if number > free:
+            raise ValueError('there are only %s empty cells' % free)
+
+        chosen = (generator or Random()).sample(range(free), number)
+        rows, columns = self.matrix.selectZeros(chosen)
+        return list(zip(rows.tolist(), columns.tolist()))
+
+    def getRuns(self):
+        # se desempaqueta por bloques de filas para no ocupar un byte por
+        # celula de todo el tablero
+        for top in range(0, self.height, 1024):
+            for run in findRuns(self.matrix.getBits(top, top + 1024), top):
+                yield run
+
+    def computeHash(self):
+        rows, columns = np.nonzero(self.matrix.words)
+        return wordXor(rows, columns, self.matrix.words[rows, columns])
+
+    def cellChanged(self, i, j):
+        # el hash es por palabra, se recalcula en lugar de cambiar una clave
+        if self.historySize:
+            self.hash = self.computeHash()
+        self.resetHistory()
+
+    def shiftWest(self, words):
+        """la celda j de cada fila toma el valor de la celda j - 1"""
+        one, top = np.uint64(1), np.uint64(63)
+
+        shifted = (words << one) | (np.roll(words, 1, axis=1) >> top)
+        shifted[:, 0] &= ~one
+        shifted[:, 0] |= (words[:, -1] >> self.lastBit) & one
+
+        return shifted
+
+    def shiftEast(self, words):
+        """la celda j de cada fila toma el valor de la celda j + 1"""
+        one, top = np.uint64(1), np.uint64(63)
+
+        shifted = (words >> one) | (np.roll(words, -1, axis=1) << top)
+        shifted[:, -1] &= self.lastMask
+        shifted[:, -1] |= (words[:, 0] & one) << self.lastBit
+
+        return shifted
+
+    def nextGeneration(self):
+        center = self.matrix.words
+        west = self.shiftWest(center)
+        east = self.shiftEast(center)
+
+        # suma de las tres celdas de cada fila(dos bits) y de las dos
+        # vecinas de la fila central
+        row0 = west ^ center ^ east
+        row1 = (west & center) | (east & (west ^ center))
+        middle0 = west ^ east
+        middle1 = west & east
+
+        up0, down0 = np.roll(row0, 1, axis=0), np.roll(row0, -1, axis=0)
+        up1, down1 = np.roll(row1, 1, axis=0), np.roll(row1, -1, axis=0)
+
+        bit0 = up0 ^ down0 ^ middle0
+        carry = (up0 & down0) | (middle0 & (up0 ^ down0))
+
+        # el numero de vecinos es 2 o 3 si exactamente uno de los sumandos
+        # del segundo bit esta encendido
+        pairs = (up1 & down1) | (middle1 & carry) | ((up1 ^ down1) &
+                                                     (middle1 ^ carry))
+        bit1 = up1 ^ down1 ^ middle1 ^ carry
+
+        words = bit1 & ~pairs & (bit0 | center)
+        words[:, -1] &= self.lastMask
+
+        if self.historySize:
+            rows, columns = np.nonzero(center ^ words)
+            self.hash ^= wordXor(rows, columns, center[rows, columns])
+            self.hash ^= wordXor(rows, columns, words[rows, columns])
+        self.matrix.words = words
+        self.alives = self.matrix.count()
+
+
+class HashGameOfLife(GameOfLife):
+    """GameOfLife en el plano infinito calculado con HashLife, self.matrix es
+       la ventana del plano que se muestra en pantalla y cada actualizacion
+       avanza 2^jump generaciones"""
+
+    def __init__(self, name, width, height, colors, filename=None, jump=0,
+                 maxNodes=1 << 20):
+        super(HashGameOfLife, self).__init__(name, width, height, colors,
+                                             filename=filename)
+
+        self.events['mousebuttondown'].append(self.__setCell)
+        self.events['mousemotion'].append(self.__setCell)
+
+        self.life = HashLife(self.matrix, maxNodes=maxNodes)
+        self.alives = self.life.alives
+        self.jump = jump
+
+    def __setCell(self, pos, _):
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.life.setCell(x, y, self.matrix[y][x])
+
+    def getCaption(self):
+        return 'Alives: %s Generation: %s' % (self.alives,
+                                              self.life.generation)
+
+    def computeHash(self):
+        return 0
+
+    def clear(self, key):
+        """limpia el tablero"""
+        super(HashGameOfLife, self).clear(key)
+        if key == 'c':
+            self.life.setMatrix(self.matrix)
+
+    def putCellsAlives(self, alives, generator=None):
+        super(HashGameOfLife, self).putCellsAlives(alives, generator)
+        self.life.setMatrix(self.matrix)
+
+    def loadPattern(self, filename):
+        self.life.setCells((j + k, i) for i, j, length in
+                           patterns.readRuns(filename) for k in range(length))
+
+        self.matrix = self.life.getMatrix(0, 0, self.width, self.height)
+        self.alives = self.life.alives
+        self.resetHash()
+
+    def exportPattern(self, filename):
+        runs, width, height = patterns.getRunsFromCells(
+            (y, x) for x, y in self.life.getCells())
+        patterns.write(filename, runs, width, height, self.rule)
+
+    def registerGeneration(self):
+        """HashLife avanza 2^jump generaciones de una vez, por lo que no se
+           lleva historial de los estados"""
+        self.generation = self.life.generation
+
+    def nextGeneration(self):
+        self.life.step(self.jump)
+
+        self.matrix = self.life.getMatrix(0, 0, self.width, self.height)
+        self.alives = self.life.alives
+
+
+class SparseGameOfLife(GameOfLife):
+    """GameOfLife en el plano infinito en el que solo se guardan las
+       coordenadas(fila, columna) de las celulas vivas, self.matrix es la
+       ventana del plano que se muestra en pantalla, con esquina superior
+       izquierda en self.top, self.left, y se mueve con las flechas"""
+
+    def __init__(self, name, width, height, colors, filename=None,
+                 historySize=0):
+        self.cells = set()
+        self.top = 0
+        self.left = 0
+
+        super(SparseGameOfLife, self).__init__(name, width, height, colors,
+                                               filename=filename,
+                                               historySize=historySize)
+
+        self.events['mousebuttondown'].append(self.__setCell)
+        self.events['mousemotion'].append(self.__setCell)
+        self.events['keydown'].append(self.__moveWindow)
+
+        self.scroll = max(1, min(self.width, self.height) // 10)
+        self.setCells(self.matrix)
+        self.resetHash()
+
+    def __setCell(self, pos, _):
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            cell = (self.top + y, self.left + x)
+            if self.matrix[y][x]:
+                self.cells.add(cell)
+            else:
+                self.cells.discard(cell)
+            self.alives = len(self.cells)
+
+    def __moveWindow(self, key):
+        moves = {'up': (-1, 0), 'down': (1, 0), 'left': (0, -1),
+                 'right': (0, 1)}
+
+        if key in moves:
+            i, j = moves[key]
+            self.top += i * self.scroll
+            self.left += j * self.scroll
+            self.matrix = self.getWindow()
+
+    def setCells(self, matrix):
+        """reemplaza las celulas vivas por las de matrix, con su esquina
+           superior izquierda en la esquina de la ventana"""
+        self.cells = set((self.top + i, self.left + j)
+                         for i, row in enumerate(matrix)
+                         for j, value in enumerate(row) if value)
+        self.alives = len(self.cells)
+
+    def getWindow(self):
+        matrix = [[0] * self.width for i in range(self.height)]
+
+        for i, j in self.cells:
+            i -= self.top
+            j -= self.left
+            if 0 <= i < self.height and 0 <= j < self.width:
+                matrix[i][j] = 1
+
+        return matrix
+
+    def getCaption(self):
+        caption = super(SparseGameOfLife, self).getCaption()
+        return caption + ' Window: (%s, %s)' % (self.top, self.left)
+
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.cells = set()
+        super(SparseGameOfLife, self).clear(key)
+
+    def putCellsAlives(self, alives, generator=None):
+        super(SparseGameOfLife, self).putCellsAlives(alives, generator)
+        self.setCells(self.matrix)
+        self.resetHash()
+
+    def setRun(self, i, j, length):
+        self.cells.update((self.top + i, self.left + j + k)
+                          for k in range(length))
+
+    def boardChanged(self):
+        self.matrix = self.getWindow()
+        super(SparseGameOfLife, self).boardChanged()
+
+    def countAlives(self):
+        return len(self.cells)
+
+    def exportPattern(self, filename):
+        runs, width, height = patterns.getRunsFromCells(self.cells)
+        patterns.write(filename, runs, width, height, self.rule)
+
+    def computeHash(self):
+        value = 0
+        for i, j in self.cells:
+            value ^= zobrist(i, j)
+        return value
+
+    def cellChanged(self, i, j):
+        super(SparseGameOfLife, self).cellChanged(self.top + i, self.left + j)
+
+    def nextGeneration(self):
+        neighbors = Counter((i + r, j + c) for i, j in self.cells
+                            for r in (-1, 0, 1) for c in (-1, 0, 1)
+                            if r or c)
+
+        cells = set(cell for cell, alives in neighbors.items()
+                    if alives == 3 or (alives == 2 and cell in self.cells))
+
+        if self.historySize:
+            for i, j in cells ^ self.cells:
+                self.hash ^= zobrist(i, j)
+
+        self.cells = cells
+        self.alives = len(self.cells)
+        self.matrix = self.getWindow()
+
+
+def lifeStep(tile):
+    """tile tiene una fila de halo arriba y otra abajo, retorna la siguiente
+       generacion de las filas interiores(las columnas dan la vuelta)"""
+    center = tile[1:-1]
+    vertical = tile[:-2] + center + tile[2:]
+    neighbors = (vertical + np.roll(vertical, 1, 1) +
+                 np.roll(vertical, -1, 1) - center)
+
+    return ((neighbors == 3) | ((center == 1) & (neighbors == 2))).view(
+        np.uint8)
+
+
+def worker(buffers, shape, top, bottom, command, control, step, alives,
+           hashes, index, hashing):
+    """ciclo de un proceso, espera en control el numero de generaciones a
+       calcular(negativo para terminar) y las calcula sobre las filas top
+       hasta bottom - 1, si hashing es verdadero tambien el xor de las claves
+       de las celdas que cambian"""
+    boards = [np.frombuffer(buf, dtype=np.uint8).reshape(shape)
+              for buf in buffers]
+    rows = np.arange(top - 1, bottom + 1) % shape[0]
+    current = 0
+
+    while True:
+        control.wait()
+        generations = command.value
+        if generations < 0:
+            break
+
+        flipped = 0
+        for generation in range(generations):
+            # intercambio de halos: la franja con una fila de cada vecina
+            tile = boards[current].take(rows, axis=0)
+            new = lifeStep(tile)
+
+            if hashing:
+                changed = np.nonzero(new != tile[1:-1])
+                flipped ^= zobristXor(changed[0] + top, changed[1])
+
+            boards[1 - current][top:bottom] = new
+            current = 1 - current
+            step.wait()
+
+        alives[index] = int(np.count_nonzero(boards[current][top:bottom]))
+        hashes[index] = flipped
+        control.wait()
+
+
+class ParallelGameOfLife(NumpyGameOfLife):
+    """NumpyGameOfLife en el que cada generacion se calcula con processes
+       procesos. El toro se divide en franjas de filas y cada proceso
+       actualiza la suya leyendo una fila de halo de cada vecina, el tablero
+       esta dos veces en memoria compartida(generacion actual y siguiente) y
+       self.matrix es siempre una vista de la generacion actual. Una barrera
+       entre generaciones mantiene a todos los procesos en la misma
+       generacion. Los procesos se terminan con close, al salir de un bloque
+       with o al cerrar la ventana"""
+
+    def __init__(self, name, width, height, colors, filename=None,
+                 processes=2, historySize=0):
+        self.processes = processes
+        self.workers = []
+
+        super(ParallelGameOfLife, self).__init__(name, width, height, colors,
+                                                 filename=filename,
+                                                 historySize=historySize)
+
+        self.processes = max(1, min(processes, self.height))
+
+    def buildMatrix(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.uint8)
+        size = matrix.shape[0] * matrix.shape[1]
+
+        self.buffers = [RawArray('B', size), RawArray('B', size)]
+        self.boards = [np.frombuffer(buf, dtype=np.uint8).reshape(
+            matrix.shape) for buf in self.buffers]
+        self.boards[0][:] = matrix
+        self.current = 0
+
+        return self.boards[0]
+
+    def emptyMatrix(self, width, height):
+        return self.buildMatrix(np.zeros((height, width), dtype=np.uint8))
+
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix[:] = 0
+            self.alives = 0
+            self.resetHash()
+
+    def start(self):
+        """reparte las filas entre los procesos y los inicia"""
+        bounds = np.linspace(0, self.height, self.processes + 1).astype(int)
+
+        self.command = RawValue('l', 0)
+        self.control = Barrier(self.processes + 1)
+        self.step = Barrier(self.processes)
+        self.alivesByTile = RawArray('q', self.processes)
+        self.hashesByTile = RawArray('Q', self.processes)
+
+        for index in range(self.processes):
+            process = Process(target=worker, args=(
+                self.buffers, self.matrix.shape, bounds[index],
+                bounds[index + 1], self.command, self.control, self.step,
+                self.alivesByTile, self.hashesByTile, index,
+                bool(self.historySize)))
+            process.daemon = True
+            process.start()
+            self.workers.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """termina los procesos"""
+        if self.workers:
+            self.command.value = -1
+            self.control.wait()
+            for process in self.workers:
+                process.join()
+            self.workers = []
+
+    def advance(self, generations):
+        """avanza generations generaciones sin registrarlas en el
+           historial"""
+        if not self.workers:
+            self.start()
+
+        self.command.value = generations
+        self.control.wait()
+        self.control.wait()
+
+        self.current = (self.current + generations) % 2
+        self.matrix = self.boards[self.current]
+        self.alives = sum(self.alivesByTile)
+        for value in self.hashesByTile:
+            self.hash ^= value
+
+    def nextGeneration(self):
+        self.advance(1)
+
+
+ENGINES = {'python': GameOfLife, 'numpy': NumpyGameOfLife,
+           'active': ActiveGameOfLife, 'bits': BitGameOfLife,
+           'hashlife': HashGameOfLife, 'sparse': SparseGameOfLife,
+           'rule': RuleGameOfLife, 'parallel': ParallelGameOfLife}
+
 
 def validateColor(color):
     if len(color) == 3:
@@ -113,10 +1147,12 @@ manual en el que se pasa al siguiente frame de simulacion mediante la pulsacion
 de la tecla SPACE y otro en el que se fija los frames por segundo, se puede
 pausar con la tecla p ademas se puede tomar una captura de pantalla con la
 tecla s, si se presiona la tecla c se limpia el tablero y si se presiona la
-tecla e la configuracion del tablero se guarda en un archivo de texto. Se
-permite tambien agregar o quitar celulas presionando con el click derecho o
-izquierdo respectivamente con el mouse en la celda. El programa tambien permite
-cargar configuraciones para el tablero desde un archivo de texto.
+tecla e la configuracion del tablero se guarda en un archivo de texto(con la
+tecla r se guarda como patron RLE). Se permite tambien agregar o quitar
+celulas presionando con el click derecho o izquierdo respectivamente con el
+mouse en la celda. El programa tambien permite cargar configuraciones para el
+tablero desde un archivo de texto o desde patrones RLE(.rle) y Life 1.06(.lif,
+.life).
 
 
 Los colores disponibles son:
@@ -179,15 +1215,63 @@ Los colores disponibles son:
     parser.add_argument('-fps', '--frame-per-seconds', type=int, dest='fps',
                         default=30, help='''frames por segundo la simulacion
                         corre automaticamente''')
+    parser.add_argument('-e', '--engine', choices=sorted(ENGINES),
+                        default='python', help='''motor con el que se
+                        calcula cada generacion''')
+    parser.add_argument('-j', '--jump', type=int, default=0,
+                        help='''con el motor hashlife cada actualizacion
+                        avanza 2^JUMP generaciones''')
+    parser.add_argument('-r', '--rule', type=parseRule, default='B3/S23',
+                        help='''regla del automata en formato B/S(por
+                        ejemplo B36/S23), solo se usa con el motor rule''')
+    parser.add_argument('-p', '--processes', type=int, default=2,
+                        help='''numero de procesos, solo se usa con el motor
+                        parallel''')
+    parser.add_argument('-s', '--seed', type=int, default=None,
+                        help='''semilla para poner las celulas vivas al
+                        azar''')
+    parser.add_argument('-sc', '--stop-on-cycle', action='store_true',
+                        help='''detiene la simulacion cuando el tablero se
+                        repite(el transitorio y el periodo se muestran en
+                        el titulo de la ventana)''')
+    parser.add_argument('-hs', '--history-size', type=int, default=None,
+                        help='''numero de estados que se guardan para
+                        detectar ciclos, 0 no los detecta(por defecto 1000
+                        con -sc y 0 sin el)''')
 
     args = parser.parse_args()
 
     colors = {1: args.color_alive, 0: args.color_death}
 
-    gameoflife = GameOfLife(args.name, args.width, args.height, colors,
-                            filename=args.filename)
-    if not args.filename:
-        gameoflife.putCellsAlives(args.alives)
+    width, height = args.width, args.height
+    pattern = args.filename and patterns.getFormat(args.filename)
+
+    options = {}
+    if pattern:
+        patternWidth, patternHeight = patterns.getSize(args.filename)
+        width = max(width, patternWidth)
+        height = max(height, patternHeight)
+    else:
+        options['filename'] = args.filename
+    if args.engine == 'hashlife':
+        options['jump'] = args.jump
+    if args.engine == 'rule':
+        options['rule'] = args.rule
+    if args.engine == 'parallel':
+        options['processes'] = args.processes
+    if args.engine != 'hashlife':
+        historySize = args.history_size
+        if historySize is None:
+            historySize = 1000 if args.stop_on_cycle else 0
+        options['historySize'] = historySize
+
+    gameoflife = ENGINES[args.engine](args.name, width, height, colors,
+                                      **options)
+    if pattern:
+        gameoflife.loadPattern(args.filename)
+    elif not args.filename:
+        gameoflife.putCellsAlives(args.alives, Random(args.seed))
+    gameoflife.stopOnCycle = args.stop_on_cycle
 
     graph = CellGraph(gameoflife, cellwidth=args.cell_width, fps=args.fps,
                       cellheight=args.cell_height,
@@ -0,0 +1,351 @@
+"""Implementacion de HashLife para el juego de la vida en el plano infinito.
+
+El universo se representa como un quadtree en el que cada nodo es canonico
+(dos regiones iguales son el mismo objeto), de forma que los resultados de
+avanzar un nodo se memorizan y se reutilizan en todo el universo y en todas
+las generaciones. Esto permite avanzar 2^j generaciones de una sola vez."""
+
+
+class Node(object):
+    """nodo del quadtree, k es el nivel(el nodo cubre 2^k x 2^k celdas),
+       a, b, c, d son los hijos superior izquierdo, superior derecho,
+       inferior izquierdo e inferior derecho, n es el numero de celulas vivas
+       en el nodo"""
+
+    __slots__ = ('k', 'a', 'b', 'c', 'd', 'n')
+
+    def __init__(self, k, a, b, c, d, n):
+        self.k = k
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.n = n
+
+
+class HashLife(object):
+    """universo infinito de HashLife. x, y es la posicion de la esquina
+       superior izquierda de la raiz en el plano, maxNodes es el numero de
+       nodos a partir del cual se eliminan de la cache los nodos que no
+       pertenecen al universo actual"""
+
+    def __init__(self, matrix=None, maxNodes=1 << 20):
+        self.maxNodes = maxNodes
+        self.generation = 0
+
+        self.off = Node(0, None, None, None, None, 0)
+        self.on = Node(0, None, None, None, None, 1)
+
+        self.nodes = {}
+        self.successors = {}
+        self.zeros = [self.off]
+
+        self.root = self.getZero(3)
+        self.x = 0
+        self.y = 0
+
+        if matrix is not None:
+            self.setMatrix(matrix)
+
+    @property
+    def alives(self):
+        return self.root.n
+
+    def join(self, a, b, c, d):
+        """retorna el nodo canonico con los hijos a, b, c, d"""
+        key = (a, b, c, d)
+        node = self.nodes.get(key)
+
+        if node is None:
+            node = Node(a.k + 1, a, b, c, d, a.n + b.n + c.n + d.n)
+            self.nodes[key] = node
+
+        return node
+
+    def getZero(self, k):
+        """retorna el nodo vacio de nivel k"""
+        while len(self.zeros) <= k:
+            zero = self.zeros[-1]
+            self.zeros.append(self.join(zero, zero, zero, zero))
+
+        return self.zeros[k]
+
+    def centre(self, node):
+        """retorna un nodo de nivel k + 1 con node en el centro"""
+        zero = self.getZero(node.k - 1)
+
+        return self.join(self.join(zero, zero, zero, node.a),
+                         self.join(zero, zero, node.b, zero),
+                         self.join(zero, node.c, zero, zero),
+                         self.join(node.d, zero, zero, zero))
+
+    def isPadded(self, node):
+        """indica si todas las celulas vivas estan en el cuadrado central del
+           nodo"""
+        return (node.a.n == node.a.d.n and node.b.n == node.b.c.n and
+                node.c.n == node.c.b.n and node.d.n == node.d.a.n)
+
+    def life(self, cell, neighbors):
+        """aplica la regla B3/S23 a una celula"""
+        alives = sum(neighbor.n for neighbor in neighbors)
+
+        if alives == 3 or (alives == 2 and cell.n):
+            return self.on
+        return self.off
+
+    def life4x4(self, m):
+        """retorna el centro 2x2 de un nodo de nivel 2 una generacion
+           despues"""
+        ad = self.life(m.a.d, (m.a.a, m.a.b, m.b.a, m.a.c, m.b.c, m.c.a,
+                               m.c.b, m.d.a))
+        bc = self.life(m.b.c, (m.a.b, m.b.a, m.b.b, m.a.d, m.b.d, m.c.b,
+                               m.d.a, m.d.b))
+        cb = self.life(m.c.b, (m.a.c, m.a.d, m.b.c, m.c.a, m.d.a, m.c.c,
+                               m.c.d, m.d.c))
+        da = self.life(m.d.a, (m.a.d, m.b.c, m.b.d, m.c.b, m.d.b, m.c.d,
+                               m.d.c, m.d.d))
+
+        return self.join(ad, bc, cb, da)
+
+    def successor(self, m, j):
+        """retorna el centro de m(nivel k - 1) avanzado 2^j generaciones,
+           j debe ser menor o igual a k - 2"""
+        if m.n == 0:
+            return m.a
+
+        key = (m, j)
+        result = self.successors.get(key)
+        if result is not None:
+            return result
+
+        if m.k == 2:
+            result = self.life4x4(m)
+        else:
+            join = self.join
+            # si j es el maximo el avance se reparte en dos mitades
+            i = min(j, m.k - 3)
+            c1 = self.successor(m.a, i)
+            c2 = self.successor(join(m.a.b, m.b.a, m.a.d, m.b.c), i)
+            c3 = self.successor(m.b, i)
+            c4 = self.successor(join(m.a.c, m.a.d, m.c.a, m.c.b), i)
+            c5 = self.successor(join(m.a.d, m.b.c, m.c.b, m.d.a), i)
+            c6 = self.successor(join(m.b.c, m.b.d, m.d.a, m.d.b), i)
+            c7 = self.successor(m.c, i)
+            c8 = self.successor(join(m.c.b, m.d.a, m.c.d, m.d.c), i)
+            c9 = self.successor(m.d, i)
+
+            if j < m.k - 2:
+                result = join(join(c1.d, c2.c, c4.b, c5.a),
+                              join(c2.d, c3.c, c5.b, c6.a),
+                              join(c4.d, c5.c, c7.b, c8.a),
+                              join(c5.d, c6.c, c8.b, c9.a))
+            else:
+                result = join(self.successor(join(c1, c2, c4, c5), j - 1),
+                              self.successor(join(c2, c3, c5, c6), j - 1),
+                              self.successor(join(c4, c5, c7, c8), j - 1),
+                              self.successor(join(c5, c6, c8, c9), j - 1))
+
+        self.successors[key] = result
+        return result
+
+    def expand(self):
+        """duplica el tamano de la raiz manteniendola centrada"""
+        half = 1 << (self.root.k - 1)
+
+        self.root = self.centre(self.root)
+        self.x -= half
+        self.y -= half
+
+    def step(self, j=0):
+        """avanza el universo 2^j generaciones"""
+        while self.root.k < j + 2 or not self.isPadded(self.root):
+            self.expand()
+        self.expand()
+
+        quarter = 1 << (self.root.k - 2)
+
+        self.root = self.successor(self.root, j)
+        self.x += quarter
+        self.y += quarter
+        self.generation += 1 << j
+
+        if len(self.nodes) > self.maxNodes:
+            self.collect()
+
+    def advance(self, generations):
+        """avanza el universo un numero arbitrario de generaciones"""
+        j = 0
+        while generations:
+            if generations & 1:
+                self.step(j)
+            generations >>= 1
+            j += 1
+
+    def collect(self):
+        """vacia la cache y vuelve a construir solo los nodos de la raiz"""
+        old = self.root
+        self.nodes = {}
+        self.successors = {}
+        self.zeros = [self.off]
+
+        rebuilt = {self.off: self.off, self.on: self.on}
+
+        def rebuild(node):
+            result = rebuilt.get(node)
+            if result is None:
+                result = self.join(rebuild(node.a), rebuild(node.b),
+                                   rebuild(node.c), rebuild(node.d))
+                rebuilt[node] = result
+            return result
+
+        self.root = rebuild(old)
+
+    def build(self, matrix, k, i, j):
+        """construye el nodo de nivel k cuya esquina superior izquierda esta
+           en la fila i, columna j de matrix"""
+        if i >= len(matrix) or j >= len(matrix[0]):
+            return self.getZero(k)
+
+        if k == 0:
+            return self.on if matrix[i][j] else self.off
+
+        half = 1 << (k - 1)
+
+        return self.join(self.build(matrix, k - 1, i, j),
+                         self.build(matrix, k - 1, i, j + half),
+                         self.build(matrix, k - 1, i + half, j),
+                         self.build(matrix, k - 1, i + half, j + half))
+
+    def setMatrix(self, matrix, x=0, y=0):
+        """reemplaza el universo por matrix(0/1), con su esquina superior
+           izquierda en la posicion x, y, y vuelve a la generacion 0"""
+        self.generation = 0
+
+        k = 3
+        while (1 << k) < max(len(matrix), len(matrix[0])):
+            k += 1
+
+        self.root = self.build(matrix, k, 0, 0)
+        self.x = x
+        self.y = y
+
+    def setCells(self, cells):
+        """reemplaza el universo por las celulas vivas de cells, un iterable
+           de coordenadas (x, y), construyendo el quadtree desde las hojas, y
+           vuelve a la generacion 0"""
+        self.generation = 0
+        level = dict.fromkeys(cells, self.on)
+
+        if not level:
+            self.root = self.getZero(3)
+            self.x = self.y = 0
+            return
+
+        xmin = min(x for x, y in level)
+        ymin = min(y for x, y in level)
+        size = max(max(x - xmin, y - ymin) for x, y in level) + 1
+        level = dict(((x - xmin, y - ymin), node)
+                     for (x, y), node in level.items())
+
+        k = 0
+        while k < 3 or (1 << k) < size:
+            zero = self.getZero(k)
+            parents = set((x >> 1, y >> 1) for x, y in level)
+            level = dict(((x, y), self.join(
+                level.get((2 * x, 2 * y), zero),
+                level.get((2 * x + 1, 2 * y), zero),
+                level.get((2 * x, 2 * y + 1), zero),
+                level.get((2 * x + 1, 2 * y + 1), zero))) for x, y in parents)
+            k += 1
+
+        self.root = level[(0, 0)]
+        self.x = xmin
+        self.y = ymin
+
+    def getCells(self):
+        """genera las coordenadas (x, y) de las celulas vivas"""
+        stack = [(self.root, self.x, self.y)]
+
+        while stack:
+            node, x, y = stack.pop()
+            if node.n == 0:
+                continue
+            if node.k == 0:
+                yield x, y
+                continue
+
+            half = 1 << (node.k - 1)
+            stack.append((node.a, x, y))
+            stack.append((node.b, x + half, y))
+            stack.append((node.c, x, y + half))
+            stack.append((node.d, x + half, y + half))
+
+    def getCell(self, x, y):
+        node = self.root
+        x -= self.x
+        y -= self.y
+
+        if not (0 <= x < (1 << node.k) and 0 <= y < (1 << node.k)):
+            return 0
+
+        while node.k > 0 and node.n:
+            half = 1 << (node.k - 1)
+            if y < half:
+                node = node.a if x < half else node.b
+            else:
+                node = node.c if x < half else node.d
+            x %= half
+            y %= half
+
+        return node.n
+
+    def setCell(self, x, y, value):
+        while not (self.x <= x < self.x + (1 << self.root.k) and
+                   self.y <= y < self.y + (1 << self.root.k)):
+            self.expand()
+
+        def replace(node, x, y):
+            if node.k == 0:
+                return self.on if value else self.off
+
+            half = 1 << (node.k - 1)
+            a, b, c, d = node.a, node.b, node.c, node.d
+            if y < half:
+                if x < half:
+                    a = replace(a, x, y)
+                else:
+                    b = replace(b, x - half, y)
+            else:
+                if x < half:
+                    c = replace(c, x, y - half)
+                else:
+                    d = replace(d, x - half, y - half)
+
+            return self.join(a, b, c, d)
+
+        self.root = replace(self.root, x - self.x, y - self.y)
+
+    def getMatrix(self, x, y, width, height):
+        """retorna la ventana del plano de tamano width x height con esquina
+           superior izquierda en x, y como una matrix de 0 y 1"""
+        matrix = [[0] * width for i in range(height)]
+
+        def fill(node, left, top):
+            size = 1 << node.k
+            if (node.n == 0 or left >= x + width or top >= y + height or
+                    left + size <= x or top + size <= y):
+                return
+
+            if node.k == 0:
+                matrix[top - y][left - x] = 1
+                return
+
+            half = size >> 1
+            fill(node.a, left, top)
+            fill(node.b, left + half, top)
+            fill(node.c, left, top + half)
+            fill(node.d, left + half, top + half)
+
+        fill(self.root, self.x, self.y)
+
+        return matrix
@@ -0,0 +1,67 @@
+"""Medicion de la aceleracion del juego de la vida en paralelo(ver
+ParallelGameOfLife en game_of_life.py) segun el numero de procesos."""
+
+from argparse import ArgumentParser
+from game_of_life import NumpyGameOfLife, ParallelGameOfLife
+from time import time
+import numpy as np
+
+
+def benchmark(width, height, generations, processes, density=0.3, seed=0):
+    """mide el tiempo de generations generaciones con 1 hasta processes
+       procesos(en potencias de 2) y lo compara con NumpyGameOfLife"""
+    board = np.random.RandomState(seed).rand(height, width) < density
+
+    life = NumpyGameOfLife('numpy', width, height, {})
+    life.matrix[:] = board
+    start = time()
+    for generation in range(generations):
+        life.nextGeneration()
+    base = time() - start
+    print('numpy      %8.3fs' % base)
+
+    counts = []
+    count = 1
+    while count < processes:
+        counts.append(count)
+        count *= 2
+    counts.append(processes)
+
+    reference = None
+    for count in counts:
+        life = ParallelGameOfLife('parallel', width, height, {},
+                                  processes=count)
+        life.matrix[:] = board
+        life.start()
+
+        start = time()
+        life.advance(generations)
+        elapsed = time() - start
+        life.close()
+
+        reference = reference or elapsed
+        print('%2d process %8.3fs speedup %5.2f (vs numpy %5.2f)' % (
+            count, elapsed, reference / elapsed, base / elapsed))
+
+
+def main():
+    parser = ArgumentParser(description='''mide la aceleracion del juego de
+                            la vida en paralelo segun el numero de
+                            procesos''')
+
+    parser.add_argument('-w', '--width', type=int, default=2048,
+                        help='numero de celdas horizontales')
+    parser.add_argument('-ht', '--height', type=int, default=2048,
+                        help='numero de celdas verticales')
+    parser.add_argument('-g', '--generations', type=int, default=100,
+                        help='numero de generaciones')
+    parser.add_argument('-p', '--processes', type=int, default=4,
+                        help='numero maximo de procesos')
+
+    args = parser.parse_args()
+
+    benchmark(args.width, args.height, args.generations, args.processes)
+
+
+if __name__ == '__main__':
+    main()
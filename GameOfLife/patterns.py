@@ -0,0 +1,205 @@
+"""Lectura y escritura de patrones en los formatos RLE y Life 1.06.
+
+Los lectores recorren el archivo linea por linea y generan corridas
+(fila, columna, largo) de celulas vivas, de modo que el patron se escribe
+directamente en la representacion del tablero sin pasar por una lista de
+listas. Los escritores reciben las corridas en orden de filas."""
+
+from os.path import splitext
+import re
+
+
+TOKEN = re.compile(r'(\d*)([^\d\s])')
+HEADER = re.compile(r'(\w+)\s*=\s*([^,\s]+)')
+
+FORMATS = {'.rle': 'rle', '.lif': 'life106', '.life': 'life106'}
+
+
+def getFormat(filename):
+    """retorna el formato del patron segun la extension del archivo o None
+       si es el formato de digitos de System.getMatrixFromFile"""
+    return FORMATS.get(splitext(filename)[1].lower())
+
+
+def readHeader(filename):
+    """retorna un diccionario con los campos de la cabecera de un archivo
+       RLE(x, y y opcionalmente rule)"""
+    with open(filename, 'r') as fichero:
+        for line in fichero:
+            if line.startswith('#') or not line.strip():
+                continue
+            if line.lstrip().startswith('x'):
+                return dict(HEADER.findall(line))
+            break
+
+    return {}
+
+
+def readRLE(filename):
+    """genera las corridas de celulas vivas de un archivo RLE"""
+    i = j = 0
+    started = False
+
+    with open(filename, 'r') as fichero:
+        for line in fichero:
+            if line.startswith('#'):
+                continue
+            if not started and line.lstrip().startswith('x'):
+                started = True
+                continue
+
+            started = True
+            for count, tag in TOKEN.findall(line):
+                count = int(count) if count else 1
+
+                if tag == '!':
+                    return
+                if tag == '$':
+                    i += count
+                    j = 0
+                elif tag in 'b.':
+                    j += count
+                else:
+                    yield i, j, count
+                    j += count
+
+
+def iterLife106(filename):
+    """genera las coordenadas (x, y) de un archivo Life 1.06"""
+    with open(filename, 'r') as fichero:
+        for line in fichero:
+            if line.startswith('#') or not line.strip():
+                continue
+            x, y = line.split()
+            yield int(x), int(y)
+
+
+def getBounds(cells):
+    """retorna (xmin, ymin, xmax, ymax) de las coordenadas (x, y)"""
+    xmin = ymin = xmax = ymax = None
+
+    for x, y in cells:
+        if xmin is None:
+            xmin = xmax = x
+            ymin = ymax = y
+        else:
+            xmin, xmax = min(xmin, x), max(xmax, x)
+            ymin, ymax = min(ymin, y), max(ymax, y)
+
+    if xmin is None:
+        return 0, 0, -1, -1
+    return xmin, ymin, xmax, ymax
+
+
+def readLife106(filename):
+    """genera las celdas vivas de un archivo Life 1.06 como corridas de largo
+       1, desplazadas para que el patron empiece en la fila y columna 0"""
+    xmin, ymin, _, _ = getBounds(iterLife106(filename))
+
+    for x, y in iterLife106(filename):
+        yield y - ymin, x - xmin, 1
+
+
+def readRuns(filename):
+    """genera las corridas (fila, columna, largo) del patron"""
+    if getFormat(filename) == 'rle':
+        return readRLE(filename)
+    return readLife106(filename)
+
+
+def getSize(filename):
+    """retorna el ancho y alto del patron"""
+    if getFormat(filename) == 'rle':
+        header = readHeader(filename)
+        if 'x' in header and 'y' in header:
+            return int(header['x']), int(header['y'])
+
+        width = height = 0
+        for i, j, length in readRLE(filename):
+            width = max(width, j + length)
+            height = max(height, i + 1)
+        return width, height
+
+    xmin, ymin, xmax, ymax = getBounds(iterLife106(filename))
+    return xmax - xmin + 1, ymax - ymin + 1
+
+
+def getRunsFromCells(cells):
+    """convierte celdas (fila, columna) en las corridas ordenadas del patron
+       desplazado a la fila y columna 0, retorna (corridas, ancho, alto)"""
+    cells = sorted(cells)
+    if not cells:
+        return [], 0, 0
+
+    top = cells[0][0]
+    left = min(j for i, j in cells)
+    runs = mergeRuns((i - top, j - left, 1) for i, j in cells)
+
+    width = max(j for i, j in cells) - left + 1
+    return runs, width, cells[-1][0] - top + 1
+
+
+def mergeRuns(runs):
+    """une las corridas consecutivas de una misma fila"""
+    current = None
+
+    for i, j, length in runs:
+        if current and current[0] == i and current[1] + current[2] == j:
+            current[2] += length
+            continue
+        if current:
+            yield tuple(current)
+        current = [i, j, length]
+
+    if current:
+        yield tuple(current)
+
+
+def writeRLE(filename, runs, width, height, rule='B3/S23'):
+    """escribe las corridas(ordenadas por fila y columna) en formato RLE,
+       con lineas de a lo sumo 70 caracteres"""
+    with open(filename, 'w') as fichero:
+        fichero.write('x = %s, y = %s, rule = %s\n' % (width, height, rule))
+
+        line = ''
+        row = column = 0
+
+        def token(count, tag):
+            return (str(count) if count > 1 else '') + tag
+
+        for i, j, length in mergeRuns(runs):
+            tokens = []
+            if i > row:
+                tokens.append(token(i - row, '$'))
+                row, column = i, 0
+            if j > column:
+                tokens.append(token(j - column, 'b'))
+            tokens.append(token(length, 'o'))
+            column = j + length
+
+            for item in tokens:
+                if len(line) + len(item) > 70:
+                    fichero.write(line + '\n')
+                    line = ''
+                line += item
+
+        fichero.write(line + '!\n')
+
+
+def writeLife106(filename, runs):
+    """escribe las corridas en formato Life 1.06, x es la columna y y la
+       fila"""
+    with open(filename, 'w') as fichero:
+        fichero.write('#Life 1.06\n')
+        for i, j, length in runs:
+            for x in range(j, j + length):
+                fichero.write('%s %s\n' % (x, i))
+
+
+def write(filename, runs, width, height, rule='B3/S23'):
+    """escribe el patron en el formato que indica la extension del
+       archivo"""
+    if getFormat(filename) == 'life106':
+        writeLife106(filename, runs)
+    else:
+        writeRLE(filename, runs, width, height, rule)
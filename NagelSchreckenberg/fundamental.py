@@ -0,0 +1,126 @@
+"""Diagrama fundamental(flujo contra densidad) del modelo Nagel
+Schreckenberg sin ventana.
+
+Para cada combinacion de vmax y probabilidad de frenado se simulan juntas,
+en un solo Lanes, todas las calles circulares de una sola via: una por cada
+densidad y cada semilla. Despues de warmup pasos se acumula durante steps
+pasos la suma de las velocidades de cada calle, de donde salen el flujo
+(carros que pasan por un punto en un paso, suma de velocidades sobre el largo)
+y la velocidad promedio de cada realizacion. Las combinaciones se reparten en
+un pool de procesos y el resultado se escribe en un archivo csv con una fila
+por densidad."""
+
+from argparse import ArgumentParser
+from multiprocessing import Pool
+from nagel_schreckenberg import Lanes
+from random import Random
+import numpy as np
+import csv
+
+
+FIELDS = ['vmax', 'probability', 'density', 'cars', 'flow', 'flowStd',
+          'speed', 'speedStd', 'realizations']
+
+
+def simulate(task):
+    """calcula las filas del diagrama de una combinacion, task es (vmax,
+       probability, length, densities, seeds, warmup, steps, seed)"""
+    (vmax, probability, length, densities, seeds, warmup, steps,
+     seed) = task
+
+    generator = Random(seed)
+    counts = [int(round(density * length)) for density in densities]
+
+    lanes, positions = [], []
+    for index, count in enumerate(counts):
+        for realization in range(seeds):
+            lane = index * seeds + realization
+            lanes.extend([lane] * count)
+            positions.extend(sorted(generator.sample(range(length), count)))
+
+    road = Lanes(lanes, positions, np.zeros(len(lanes)),
+                 np.full(len(lanes), length))
+    rings = len(densities) * seeds
+    random = np.random.RandomState(seed)
+
+    for step in range(warmup):
+        road.step(vmax, probability, random)
+
+    total = np.zeros(rings)
+    for step in range(steps):
+        road.step(vmax, probability, random)
+        total += np.bincount(road.lanes, road.velocities, minlength=rings)
+
+    rows = []
+    for index, (density, count) in enumerate(zip(densities, counts)):
+        velocities = total[index * seeds:(index + 1) * seeds] / steps
+        flows = velocities / length
+        speeds = velocities / count if count else np.zeros(seeds)
+
+        rows.append([vmax, probability, density, count, flows.mean(),
+                     flows.std(), speeds.mean(), speeds.std(), seeds])
+
+    return rows
+
+
+def diagram(vmaxs, probabilities, length, densities, seeds, warmup, steps,
+            seed=0, processes=None, output='fundamental.csv'):
+    """calcula el diagrama fundamental de cada combinacion de vmaxs y
+       probabilities y lo escribe en output"""
+    tasks = [(vmax, probability, length, densities, seeds, warmup, steps,
+              seed) for vmax in vmaxs for probability in probabilities]
+
+    pool = Pool(processes)
+    try:
+        results = pool.map(simulate, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    rows = [row for result in results for row in result]
+    with open(output, 'w') as fichero:
+        writer = csv.writer(fichero)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+
+    return rows
+
+
+def main():
+    parser = ArgumentParser(description='''diagrama fundamental del modelo
+                            Nagel Schreckenberg en una calle circular de una
+                            via, escribe el flujo y la velocidad promedio de
+                            cada densidad en un archivo csv''')
+
+    parser.add_argument('-v', '--vmax', type=int, nargs='+', default=[5],
+                        help='velocidades maximas')
+    parser.add_argument('-bp', '--break-probability', type=float, nargs='+',
+                        default=[0.25], dest='probabilities',
+                        help='probabilidades de frenar al azar')
+    parser.add_argument('-l', '--length', type=int, default=1000,
+                        help='largo de la calle')
+    parser.add_argument('-d', '--densities', type=float, nargs='+',
+                        default=[k / 20.0 for k in range(1, 20)],
+                        help='fracciones de celdas ocupadas por carros')
+    parser.add_argument('-n', '--seeds', type=int, default=20,
+                        help='numero de realizaciones por densidad')
+    parser.add_argument('-wu', '--warmup', type=int, default=1000,
+                        help='pasos que se descartan al inicio')
+    parser.add_argument('-g', '--steps', type=int, default=2000,
+                        help='pasos en los que se promedia')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='semilla de las posiciones y del frenado')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='numero de procesos(por defecto uno por nucleo)')
+    parser.add_argument('-o', '--output', default='fundamental.csv',
+                        help='archivo csv con una fila por densidad')
+
+    args = parser.parse_args()
+
+    diagram(args.vmax, args.probabilities, args.length, args.densities,
+            args.seeds, args.warmup, args.steps, args.seed, args.processes,
+            args.output)
+
+
+if __name__ == '__main__':
+    main()
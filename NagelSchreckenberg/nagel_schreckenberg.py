@@ -1,7 +1,12 @@
 from __future__ import division
 
 from cellgraph import CellGraph, System, COLORS
-from random import randint, random
+from random import Random, random
+import numpy as np
+
+
+# desplazamiento (fila, columna) de cada direccion
+DIRECTIONS = {1: (0, 1), 2: (1, 0), 3: (0, -1), 4: (-1, 0)}
 
 
 class NagelSchreckenberg(System):
@@ -41,30 +46,27 @@ class NagelSchreckenberg(System):
     def getColor(self, i, j):
         return self.colors.get(self.matrix[i][j][0], 'BLACK')
 
-    def putVerticalCar(self, number):
-        ready = number
-        while ready != 0:
-            i = randint(0, self.height - 1)
-            j = randint(0, self.width - 1)
+    def getFrame(self):
+        """retorna el cuadro del diagrama espacio-tiempo, la velocidad de
+           cada celda o -1 si esta vacia"""
+        return np.array([[cell[0] if cell[1] in DIRECTIONS else -1
+                          for cell in row] for row in self.matrix],
+                        dtype=np.int8)
 
-            if self.matrix[i][j] == [-1, -1]:
-                self.matrix[i][j] = [randint(0, self.vmax), 4]
-                ready -= 1
+    def putVerticalCar(self, number, generator=None):
+        generator = generator or Random()
+        for i, j in self.getEmptyCells(number, [-1, -1], generator):
+            self.matrix[i][j] = [generator.randint(0, self.vmax), 4]
 
-    def putHorizontalCar(self, number):
-        ready = number
-        while ready != 0:
-            i = randint(0, self.height - 1)
-            j = randint(0, self.width - 1)
+    def putHorizontalCar(self, number, generator=None):
+        generator = generator or Random()
+        for i, j in self.getEmptyCells(number, [-1, -1], generator):
+            self.matrix[i][j] = [generator.randint(0, self.vmax), 1]
 
-            if self.matrix[i][j] == [-1, -1]:
-                self.matrix[i][j] = [randint(0, self.vmax), 1]
-                ready -= 1
-
-    def putCars(self, vertical=0, horizontal=0):
+    def putCars(self, vertical=0, horizontal=0, generator=None):
         if vertical + horizontal <= self.width * self.height:
-            self.putVerticalCar(vertical)
-            self.putHorizontalCar(horizontal)
+            self.putVerticalCar(vertical, generator)
+            self.putHorizontalCar(horizontal, generator)
 
     def findPredecessorDistant(self, i, j):
         distant = 0
@@ -139,6 +141,368 @@ class NagelSchreckenberg(System):
         self.updateHorizontal()
 
 
+class Lanes(object):
+    """carros de varias calles circulares guardados en arreglos de numpy
+       ordenados por calle(lanes) y por posicion en el sentido del
+       movimiento, lengths es el largo de la calle de cada carro. Como los
+       carros no se adelantan el orden no cambia: ahead[k] es el carro de
+       adelante del carro k y el espacio libre es la diferencia de
+       posiciones"""
+
+    def __init__(self, lanes, positions, velocities, lengths):
+        self.lanes = np.asarray(lanes, dtype=np.int64)
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.velocities = np.asarray(velocities, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+
+        # el carro de adelante del ultimo de cada calle es el primero
+        self.ahead = np.arange(1, len(self.lanes) + 1)
+        if len(self.lanes):
+            ends = np.flatnonzero(np.append(self.lanes[1:] != self.lanes[:-1],
+                                            True))
+            self.ahead[ends] = np.append(0, ends[:-1] + 1)
+
+    def getVelocities(self, vmax, breakProbability, generator):
+        """aplica las tres primeras reglas(acelerar, frenar por el espacio y
+           frenar al azar con probabilidad breakProbability) a todos los
+           carros a la vez y retorna las nuevas velocidades"""
+        velocities = np.minimum(self.velocities + 1, vmax)
+
+        gaps = (self.positions[self.ahead] - self.positions - 1) % \
+            self.lengths
+        velocities = np.minimum(velocities, gaps)
+
+        slow = generator.random_sample(len(velocities)) < breakProbability
+        velocities[slow] = np.maximum(velocities[slow] - 1, 0)
+
+        return velocities
+
+    def move(self, velocities):
+        """mueve cada carro tantas celdas como su velocidad"""
+        self.velocities = velocities
+        self.positions = (self.positions + velocities) % self.lengths
+
+    def step(self, vmax, breakProbability, generator):
+        """aplica las cuatro reglas a todos los carros"""
+        self.move(self.getVelocities(vmax, breakProbability, generator))
+
+
+class LaneNagelSchreckenberg(NagelSchreckenberg):
+    """NagelSchreckenberg en el que cada calle(una fila o columna y un
+       sentido) es un anillo y sus carros se guardan en un Lanes, el costo de
+       un paso depende del numero de carros y no del largo de las calles.
+       Las calles son independientes, los cruces no se resuelven. Una celda
+       vacia es [-1, -1]"""
+
+    def __init__(self, name, colors, width=0, height=0, filename=None, vmax=5,
+                 breakProbability=0.5, turnProbability=0.5, seed=None):
+        super(LaneNagelSchreckenberg, self).__init__(
+            name, colors, width=width, height=height, filename=filename,
+            vmax=vmax, breakProbability=breakProbability,
+            turnProbability=turnProbability)
+
+        if not filename:
+            self.matrix = self.emptyMatrix(self.width, self.height)
+
+        self.generator = np.random.RandomState(seed)
+        self.road = None
+
+    def emptyMatrix(self, width, height):
+        return [[[-1, -1] for j in range(width)] for i in range(height)]
+
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix = self.emptyMatrix(self.width, self.height)
+            self.road = None
+
+    def putCars(self, vertical=0, horizontal=0, generator=None):
+        super(LaneNagelSchreckenberg, self).putCars(vertical, horizontal,
+                                                    generator)
+        self.road = None
+
+    def buildLanes(self):
+        """construye las calles desde self.matrix"""
+        cars = []
+        for i, row in enumerate(self.matrix):
+            for j, (velocity, direction) in enumerate(row):
+                if direction not in DIRECTIONS:
+                    continue
+                di, dj = DIRECTIONS[direction]
+                if dj:
+                    lane = (0, i, dj)
+                    position = j if dj > 0 else self.width - 1 - j
+                else:
+                    lane = (1, j, di)
+                    position = i if di > 0 else self.height - 1 - i
+                cars.append((lane, position, max(velocity, 0), direction))
+
+        cars.sort()
+        keys = sorted(set(car[0] for car in cars))
+        ids = dict((key, k) for k, key in enumerate(keys))
+
+        self.axes = np.array([car[0][0] for car in cars], dtype=np.int64)
+        self.indices = np.array([car[0][1] for car in cars], dtype=np.int64)
+        self.signs = np.array([car[0][2] for car in cars], dtype=np.int64)
+        self.directions = [car[3] for car in cars]
+
+        self.road = Lanes([ids[car[0]] for car in cars],
+                          [car[1] for car in cars], [car[2] for car in cars],
+                          np.where(self.axes == 0, self.width, self.height))
+        self.cells = self.getCells()
+
+    def getCells(self):
+        """retorna las filas y columnas de los carros"""
+        road = self.road
+        coordinate = np.where(self.signs > 0, road.positions,
+                              road.lengths - 1 - road.positions)
+
+        return (np.where(self.axes == 0, self.indices, coordinate),
+                np.where(self.axes == 0, coordinate, self.indices))
+
+    def getFrame(self):
+        if self.road is None:
+            self.buildLanes()
+
+        frame = np.full((self.height, self.width), -1, dtype=np.int8)
+        frame[self.cells] = self.road.velocities
+        return frame
+
+    def step(self):
+        if self.road is None:
+            self.buildLanes()
+
+        self.road.step(self.vmax, self.breakProbability, self.generator)
+
+    def update(self):
+        if self.road is None:
+            self.buildLanes()
+
+        for i, j in zip(*self.cells):
+            self.matrix[i][j] = [-1, -1]
+
+        self.step()
+
+        self.cells = self.getCells()
+        for i, j, velocity, direction in zip(self.cells[0], self.cells[1],
+                                             self.road.velocities,
+                                             self.directions):
+            self.matrix[i][j] = [int(velocity), direction]
+
+
+class CityNagelSchreckenberg(LaneNagelSchreckenberg):
+    """red de calles de una ciudad: cada spacing filas hay una calle
+       horizontal y cada spacing columnas una vertical, con sentidos
+       alternados(1 y 3 las horizontales, 2 y 4 las verticales). Cada calle
+       es un anillo de un Lanes y los cruces se guardan en un indice, asi en
+       cada paso solo se resuelven los conflictos de los carros que llegan a
+       un cruce: un carro no entra a un cruce ocupado ni a uno por el que ya
+       pasa en ese paso un carro mas cercano. Un carro que termina su
+       movimiento en un cruce gira con probabilidad turnProbability y pasa al
+       arreglo de la otra calle. Las celdas que no son calle son [-2, 0]"""
+
+    def __init__(self, name, colors, width=0, height=0, filename=None, vmax=5,
+                 breakProbability=0.5, turnProbability=0.5, seed=None,
+                 spacing=8):
+        self.spacing = spacing
+
+        super(CityNagelSchreckenberg, self).__init__(
+            name, colors, width=width, height=height, filename=filename,
+            vmax=vmax, breakProbability=breakProbability,
+            turnProbability=turnProbability, seed=seed)
+
+        self.buildCrossings()
+
+    def emptyMatrix(self, width, height):
+        return [[[-1, -1] if i % self.spacing == 0 or j % self.spacing == 0
+                 else [-2, 0] for j in range(width)] for i in range(height)]
+
+    def buildCrossings(self):
+        """numera las calles(primero las horizontales) y construye el indice
+           de cruces: crossings[(calle, posicion)] es (otra calle, posicion en
+           la otra calle, celda), distances[offsets[calle] + posicion] es la
+           distancia al siguiente cruce hacia adelante e isCrossing dice si
+           la posicion es un cruce"""
+        rows = range(0, self.height, self.spacing)
+        columns = range(0, self.width, self.spacing)
+
+        self.laneIds = {}
+        axes, indices, signs, directions = [], [], [], []
+        for axis, roads, length in ((0, rows, self.width),
+                                    (1, columns, self.height)):
+            for k, index in enumerate(roads):
+                direction = (1, 3)[k % 2] if axis == 0 else (2, 4)[k % 2]
+                self.laneIds[(axis, index)] = len(axes)
+                axes.append(axis)
+                indices.append(index)
+                signs.append(sum(DIRECTIONS[direction]))
+                directions.append(direction)
+
+        self.laneAxes = np.array(axes, dtype=np.int64)
+        self.laneIndices = np.array(indices, dtype=np.int64)
+        self.laneSigns = np.array(signs, dtype=np.int64)
+        self.laneDirections = np.array(directions, dtype=np.int64)
+        self.laneLengths = np.where(self.laneAxes == 0, self.width,
+                                    self.height)
+        self.offsets = np.append(0, np.cumsum(self.laneLengths)[:-1])
+
+        self.crossings = {}
+        for i in rows:
+            for j in columns:
+                horizontal = self.laneIds[(0, i)]
+                vertical = self.laneIds[(1, j)]
+                a = self.getPosition(horizontal, i, j)
+                b = self.getPosition(vertical, i, j)
+                self.crossings[(horizontal, a)] = (vertical, b, (i, j))
+                self.crossings[(vertical, b)] = (horizontal, a, (i, j))
+
+        total = int(self.laneLengths.sum())
+        self.isCrossing = np.zeros(total, dtype=bool)
+        self.distances = np.full(total, total + self.vmax + 1,
+                                 dtype=np.int64)
+        for lane, length in enumerate(self.laneLengths):
+            positions = np.array(sorted(position for other, position
+                                        in self.crossings if other == lane),
+                                 dtype=np.int64)
+            if not len(positions):
+                continue
+
+            offset = self.offsets[lane]
+            self.isCrossing[offset + positions] = True
+
+            cells = np.arange(length)
+            following = positions[np.searchsorted(positions, cells + 1) %
+                                  len(positions)]
+            distances = (following - cells) % length
+            distances[distances == 0] = length
+            self.distances[offset:offset + length] = distances
+
+    def getPosition(self, lane, i, j):
+        """posicion de la celda (i, j) medida en el sentido de la calle"""
+        coordinate = j if self.laneAxes[lane] == 0 else i
+        if self.laneSigns[lane] > 0:
+            return coordinate
+        return self.laneLengths[lane] - 1 - coordinate
+
+    def putCars(self, vertical=0, horizontal=0, generator=None):
+        """pone carros al azar en las celdas vacias de las calles verticales
+           y horizontales que no son cruces"""
+        generator = generator or Random()
+
+        for axis, number in ((1, vertical), (0, horizontal)):
+            free = [(i, j) for i, row in enumerate(self.matrix)
+                    for j, value in enumerate(row) if value == [-1, -1] and
+                    (i, j)[axis] % self.spacing == 0 and
+                    (i, j)[1 - axis] % self.spacing != 0]
+
+            if number > len(free):
+                raise ValueError('there are only %s empty cells' % len(free))
+
+            for i, j in generator.sample(free, number):
+                self.matrix[i][j] = [generator.randint(0, self.vmax),
+                                     4 if axis else 1]
+
+        self.road = None
+
+    def buildLanes(self):
+        """construye las calles desde self.matrix, un carro va a la calle de
+           su direccion si la hay o a la calle en la que esta, los carros
+           fuera de las calles se descartan"""
+        cars = []
+        for i, row in enumerate(self.matrix):
+            for j, (velocity, direction) in enumerate(row):
+                if direction not in DIRECTIONS:
+                    continue
+
+                keys = [(0, i), (1, j)]
+                if DIRECTIONS[direction][0]:
+                    keys.reverse()
+                keys = [key for key in keys if key in self.laneIds]
+                if not keys:
+                    self.matrix[i][j] = [-2, 0]
+                    continue
+
+                lane = self.laneIds[keys[0]]
+                cars.append((lane, self.getPosition(lane, i, j),
+                             max(velocity, 0)))
+
+        cars.sort()
+        lanes = np.array([car[0] for car in cars], dtype=np.int64)
+        self.road = Lanes(lanes, [car[1] for car in cars],
+                          [car[2] for car in cars], self.laneLengths[lanes])
+        self.directions = self.laneDirections[lanes].tolist()
+        self.cells = self.getCells()
+
+    def getCells(self):
+        lanes = self.road.lanes
+        self.axes = self.laneAxes[lanes]
+        self.indices = self.laneIndices[lanes]
+        self.signs = self.laneSigns[lanes]
+
+        return super(CityNagelSchreckenberg, self).getCells()
+
+    def step(self):
+        if self.road is None:
+            self.buildLanes()
+
+        road = self.road
+        velocities = road.getVelocities(self.vmax, self.breakProbability,
+                                        self.generator)
+
+        # solo los carros que llegan a un cruce en este paso
+        offsets = self.offsets[road.lanes]
+        distances = self.distances[offsets + road.positions]
+        approaching = np.flatnonzero(velocities >= distances)
+
+        if len(approaching):
+            occupied = set(self.crossings[(lane, position)][2]
+                           for lane, position in
+                           zip(road.lanes[self.isCrossing[offsets +
+                                                          road.positions]],
+                               road.positions[self.isCrossing[
+                                   offsets + road.positions]]))
+            claimed = set()
+
+            # primero los mas cercanos al cruce
+            order = np.argsort(distances[approaching], kind='stable')
+            for k in approaching[order]:
+                lane, position = road.lanes[k], road.positions[k]
+                length, velocity = road.lengths[k], velocities[k]
+                distance = distances[k]
+
+                while distance <= velocity:
+                    crossing = (position + distance) % length
+                    cell = self.crossings[(lane, crossing)][2]
+                    if cell in occupied or cell in claimed:
+                        velocity = distance - 1
+                        break
+
+                    claimed.add(cell)
+                    distance += self.distances[self.offsets[lane] + crossing]
+
+                velocities[k] = velocity
+
+        road.move(velocities)
+
+        # los carros que terminan su movimiento en un cruce pueden girar
+        arrived = np.flatnonzero((velocities > 0) & self.isCrossing[
+            offsets + road.positions])
+        turning = arrived[self.generator.random_sample(len(arrived)) <
+                          self.turnProbability]
+
+        if len(turning):
+            lanes, positions = road.lanes.copy(), road.positions.copy()
+            for k in turning:
+                lanes[k], positions[k], cell = self.crossings[
+                    (lanes[k], positions[k])]
+
+            order = np.lexsort((positions, lanes))
+            lanes = lanes[order]
+            self.road = Lanes(lanes, positions[order],
+                              road.velocities[order], self.laneLengths[lanes])
+            self.directions = self.laneDirections[lanes].tolist()
+
+
 def main():
     colors = {0: 'BLACK', 1: 'RED', 2: 'BLUE', 3: 'YELLOW', 4: 'ORANGE',
               -1: 'WHITE'}
@@ -0,0 +1,633 @@
+"""Extraccion y simulacion de la netlist de un circuito de WireWorld.
+
+Un cable simple es una cadena de celdas en la que cada celda tiene exactamente
+dos vecinas no vacias(la anterior y la siguiente de la cadena) que no son
+vecinas entre si. En un cable cada celda solo depende de esas dos, por lo que
+el cable es una linea de retardo: se guarda como dos enteros de bits(cabezas
+y colas) y avanza un paso con unos pocos desplazamientos, sin importar su
+largo. El resto de las celdas no vacias forman regiones(diodos, compuertas,
+uniones).
+
+Las regiones que coinciden con un dibujo de GADGETS se etiquetan con su
+nombre, y una region a la que llegan los dos extremos de un mismo cable es la
+salida de un reloj. Las compuertas(GATES: diodo, xor y or) se simulan a nivel
+de compuerta: la respuesta de cada una a cada combinacion de cabezas en sus
+entradas(la funcion booleana, el retardo y los estados de sus celdas hasta
+volver a reposo) se graba una sola vez simulando su dibujo, y en el circuito
+cada compuerta en reposo que recibe cabezas reproduce la respuesta grabada en
+lugar de simularse. Si las cabezas que llegan a sus extremos no coinciden con
+las grabadas(por ejemplo dos entradas que llegan desfasadas) la compuerta pasa
+a simularse celda por celda hasta volver a reposo, asi que el resultado es
+siempre el mismo que el de WireWorld. Las demas regiones se simulan celda por
+celda."""
+
+from collections import defaultdict
+import numpy as np
+
+
+OFFSETS = [(r, c) for r in (-1, 0, 1) for c in (-1, 0, 1) if r or c]
+
+# las 8 rotaciones y reflexiones de una celda
+TRANSFORMS = (lambda i, j: (i, j), lambda i, j: (j, -i),
+              lambda i, j: (-i, -j), lambda i, j: (-j, i),
+              lambda i, j: (i, -j), lambda i, j: (-j, -i),
+              lambda i, j: (-i, j), lambda i, j: (j, i))
+
+# dibujos de referencia de cada componente con los cables que lo conectan,
+# la firma de la region se obtiene extrayendo la netlist del dibujo
+GADGETS = {
+    'diode': ['''
+       ##
+######## ########
+       ##
+'''],
+    'xor': ['''
+######
+      #
+     ####
+     #  #####
+     ####
+      #
+######
+'''],
+    'or': ['''
+######
+      #
+     #######
+      #
+######
+'''],
+    'corner': ['''
+#####
+#
+#
+#
+'''],
+}
+
+# componentes que se simulan a nivel de compuerta, en su dibujo las entradas
+# son los cables que llegan por la izquierda
+GATES = ('diode', 'xor', 'or')
+
+# pasos maximos que puede tardar una compuerta en volver a reposo
+SETTLE = 256
+
+
+def getNeighbors(cells, cell):
+    i, j = cell
+    return [(i + r, j + c) for r, c in OFFSETS if (i + r, j + c) in cells]
+
+
+def isAdjacent(a, b):
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1])) == 1
+
+
+def getPlacements(cells):
+    """genera para cada una de las 8 rotaciones y reflexiones la forma
+       normalizada de un conjunto de celdas y la funcion que lleva una celda
+       del tablero a su posicion en esa forma"""
+    for transform in TRANSFORMS:
+        moved = [transform(i, j) for i, j in cells]
+        top = min(i for i, j in moved)
+        left = min(j for i, j in moved)
+
+        def place(cell, transform=transform, top=top, left=left):
+            i, j = transform(*cell)
+            return i - top, j - left
+
+        yield tuple(sorted((i - top, j - left) for i, j in moved)), place
+
+
+def getCanonical(cells):
+    """retorna la forma normalizada de un conjunto de celdas(igual para las 8
+       rotaciones y reflexiones) y la funcion que lleva una celda del tablero
+       a su posicion en esa forma"""
+    return min(getPlacements(cells), key=lambda placement: placement[0])
+
+
+def getSignature(cells):
+    """forma normalizada de un conjunto de celdas, igual para las 8
+       rotaciones y reflexiones"""
+    return getCanonical(cells)[0]
+
+
+_library = None
+_gates = None
+
+
+def getLibrary():
+    """retorna un diccionario firma -> nombre de los componentes conocidos"""
+    global _library, _gates
+
+    if _library is None:
+        _library = {}
+        _gates = {}
+        for name, drawings in GADGETS.items():
+            for drawing in drawings:
+                lines = drawing.strip('\n').split('\n')
+                width = max(len(line) for line in lines)
+                matrix = [[int(char == '#') for char in line.ljust(width)]
+                          for line in lines]
+                for gadget in Netlist(matrix, False).gadgets:
+                    _library[gadget.signature] = name
+                if name in GATES:
+                    gate = Gate(name, matrix)
+                    _gates[gate.signature] = gate
+
+    return _library
+
+
+def getGates():
+    """retorna un diccionario firma -> Gate de las compuertas conocidas"""
+    getLibrary()
+    return _gates
+
+
+class Wire(object):
+    """cable simple, cells son sus celdas en orden, start y end son las
+       celdas de region a las que se conecta por cada extremo(None si el
+       extremo esta suelto o si el cable es un ciclo). El retardo de un
+       extremo al otro es len(cells)"""
+
+    def __init__(self, cells, start, end, cyclic=False):
+        self.cells = cells
+        self.start = start
+        self.end = end
+        self.cyclic = cyclic
+
+    @property
+    def delay(self):
+        return len(self.cells)
+
+
+class Gadget(object):
+    """region conexa de celdas que no son de cable, kind es el nombre del
+       componente si coincide con uno conocido, 'clock' si es la salida de un
+       reloj o 'region' en otro caso, wires son los indices de los cables
+       conectados. Si la region es una compuerta conocida gate es su Gate,
+       order son sus celdas en el orden de gate.points y ends los extremos
+       de cable (cable, lado) en el orden de gate.attachments"""
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.signature = getSignature(cells)
+        self.kind = 'region'
+        self.wires = []
+        self.gate = None
+        self.order = None
+        self.ends = None
+
+
+class Gate(object):
+    """compuerta grabada simulando su dibujo celda por celda. points son las
+       posiciones normalizadas de sus celdas, attachments las de las celdas
+       de los extremos de cable que la tocan e inputs los indices de
+       attachments que son entradas. responses lleva cada combinacion de
+       cabezas en los extremos(bytes con un 0 o 1 por extremo, con la
+       compuerta en reposo) a la respuesta (frames, heads): los estados de
+       sus celdas en cada paso hasta volver a reposo y las cabezas que llegan
+       a los extremos en cada paso. function lleva cada combinacion de
+       entradas a las salidas que reciben una cabeza y delay es el numero de
+       pasos que tarda en salir"""
+
+    def __init__(self, name, matrix):
+        netlist = Netlist(matrix, False)
+        gadget, = netlist.gadgets
+        self.signature, place = getCanonical(gadget.cells)
+        cells = sorted(gadget.cells, key=place)
+        ends = netlist.getEnds(gadget, place)
+
+        self.name = name
+        self.points = self.signature
+        self.attachments = [position for position, end in ends]
+        self.inputs = []
+        for k, (position, (w, side)) in enumerate(ends):
+            # el extremo suelto de una entrada esta a la izquierda
+            line = netlist.wires[w].cells
+            if side:
+                line = line[::-1]
+            if line[-1][1] < line[0][1]:
+                self.inputs.append(k)
+        outputs = [k for k in range(len(ends)) if k not in self.inputs]
+
+        self.responses = {}
+        self.function = {}
+        self.delay = None
+        for combination in range(1, 1 << len(self.inputs)):
+            board = np.array(matrix, dtype=np.uint8)
+            values = []
+            for bit, k in enumerate(self.inputs):
+                values.append(bool(combination >> bit & 1))
+                if values[-1]:
+                    # cabeza en la celda del extremo y cola detras
+                    w, side = ends[k][1]
+                    line = netlist.wires[w].cells
+                    if side:
+                        line = line[::-1]
+                    board[line[0]] = 3
+                    board[line[1]] = 2
+
+            frames, heads = self.record(netlist, board, cells, ends)
+            self.responses[heads[0]] = (frames, heads)
+
+            delays = [t for t, step in enumerate(heads)
+                      if any(step[k] for k in outputs)]
+            self.function[tuple(values)] = tuple(
+                any(step[k] for step in heads) for k in outputs)
+            if delays and (self.delay is None or delays[0] < self.delay):
+                self.delay = delays[0]
+
+    def record(self, netlist, board, cells, ends):
+        """simula el dibujo desde board hasta que la compuerta vuelve a reposo
+           y retorna (frames, heads)"""
+        simulator = NetlistSimulator(netlist, board)
+        states = [simulator.index[cell] for cell in cells]
+        positions = [simulator.getEnd(w, side) for position, (w, side) in ends]
+
+        frames, heads = [], []
+        for t in range(SETTLE):
+            vector = simulator.getHeads()
+            frames.append(simulator.states[states])
+            heads.append(vector[positions].tobytes())
+            if t and (frames[-1] == 1).all() and not any(heads[-1]):
+                return frames, heads
+            simulator.step()
+
+        raise ValueError('la compuerta %s no vuelve a reposo' % self.name)
+
+
+class Netlist(object):
+    """netlist de un tablero de WireWorld(lista de listas o arreglo)"""
+
+    def __init__(self, matrix, classify=True):
+        self.height = len(matrix)
+        self.width = len(matrix[0])
+
+        cells = set((i, j) for i, row in enumerate(matrix)
+                    for j, value in enumerate(row) if value)
+        self.neighbors = dict((cell, getNeighbors(cells, cell))
+                              for cell in cells)
+
+        self.wires = self.findWires()
+        inWire = set(cell for wire in self.wires for cell in wire.cells)
+        self.gadgets = self.findGadgets(cells - inWire)
+
+        if classify:
+            self.classify()
+
+    def isWireCell(self, cell):
+        neighbors = self.neighbors[cell]
+        return len(neighbors) < 2 or (len(neighbors) == 2 and
+                                      not isAdjacent(*neighbors))
+
+    def walk(self, previous, cell, first):
+        """recorre el cable desde cell(viniendo de previous) hasta salir a
+           una celda de region, llegar a un extremo suelto(salida None) o
+           volver a first, retorna (celdas, salida)"""
+        path = []
+
+        while cell != first and self.isWireCell(cell):
+            path.append(cell)
+            following = [neighbor for neighbor in self.neighbors[cell]
+                         if neighbor != previous]
+            if not following:
+                return path, None
+            previous, cell = cell, following[0]
+
+        return path, cell
+
+    def findWires(self):
+        wires = []
+        visited = set()
+
+        for cell in sorted(self.neighbors):
+            if cell in visited or not self.isWireCell(cell):
+                continue
+
+            neighbors = self.neighbors[cell]
+            forward, end = [], None
+            if neighbors:
+                forward, end = self.walk(cell, neighbors[0], cell)
+
+            if end == cell:
+                wire = Wire([cell] + forward, None, None, cyclic=True)
+            else:
+                backward, start = [], None
+                if len(neighbors) == 2:
+                    backward, start = self.walk(cell, neighbors[1], cell)
+                wire = Wire(backward[::-1] + [cell] + forward, start, end)
+
+            visited.update(wire.cells)
+            wires.append(wire)
+
+        return wires
+
+    def findGadgets(self, cells):
+        gadgets = []
+        owner = {}
+
+        for cell in sorted(cells):
+            if cell in owner:
+                continue
+
+            component = [cell]
+            owner[cell] = len(gadgets)
+            for current in component:
+                for neighbor in self.neighbors[current]:
+                    if neighbor in cells and neighbor not in owner:
+                        owner[neighbor] = len(gadgets)
+                        component.append(neighbor)
+
+            gadgets.append(Gadget(component))
+
+        for index, wire in enumerate(self.wires):
+            for end in (wire.start, wire.end):
+                if end is not None and index not in gadgets[owner[end]].wires:
+                    gadgets[owner[end]].wires.append(index)
+
+        return gadgets
+
+    def getEnds(self, gadget, place):
+        """extremos de cable que tocan la region como pares (posicion, (cable,
+           lado)) ordenados, posicion es la de la celda del extremo segun
+           place y el lado es 0 para el inicio del cable y 1 para el final"""
+        cells = set(gadget.cells)
+        ends = []
+
+        for w in gadget.wires:
+            wire = self.wires[w]
+            if wire.start in cells:
+                ends.append((place(wire.cells[0]), (w, 0)))
+            if wire.end in cells:
+                ends.append((place(wire.cells[-1]), (w, 1)))
+
+        return sorted(ends)
+
+    def placeGate(self, gadget, gate):
+        """si los cables llegan a la region como en el dibujo de gate la marca
+           como esa compuerta y retorna True, si la forma es simetrica prueba
+           todas las colocaciones"""
+        for signature, place in getPlacements(gadget.cells):
+            ends = self.getEnds(gadget, place)
+            if (signature == gate.signature and
+                    [position for position, end in ends] == gate.attachments):
+                gadget.gate = gate
+                gadget.order = sorted(gadget.cells, key=place)
+                gadget.ends = [end for position, end in ends]
+                return True
+
+        return False
+
+    def classify(self):
+        """etiqueta las regiones que coinciden con componentes conocidos y
+           las salidas de los relojes(un cable que sale de la region y vuelve
+           a ella), las compuertas conocidas que estan conectadas como en su
+           dibujo se simulan a nivel de compuerta"""
+        library = getLibrary()
+        gates = getGates()
+        for gadget in self.gadgets:
+            gadget.kind = library.get(gadget.signature, 'region')
+
+            gate = gates.get(gadget.signature)
+            if gate is not None and not self.placeGate(gadget, gate):
+                gadget.kind = 'region'
+
+            cells = set(gadget.cells)
+            if gadget.kind == 'region' and any(
+                    self.wires[w].start in cells and self.wires[w].end in cells
+                    for w in gadget.wires):
+                gadget.kind = 'clock'
+
+    def describe(self):
+        kinds = defaultdict(int)
+        for gadget in self.gadgets:
+            kinds[gadget.kind] += 1
+
+        wireCells = sum(wire.delay for wire in self.wires)
+        gadgetCells = sum(len(gadget.cells) for gadget in self.gadgets)
+        gates = sum(gadget.gate is not None for gadget in self.gadgets)
+
+        return ('wires: %s(%s cells) gadgets: %s(%s cells) %s '
+                'gate level: %s' % (
+                    len(self.wires), wireCells, len(self.gadgets), gadgetCells,
+                    ', '.join('%s: %s' % item
+                              for item in sorted(kinds.items())), gates))
+
+
+class NetlistSimulator(object):
+    """simula una netlist: los cables como enteros de bits que se desplazan,
+       las compuertas conocidas reproduciendo su respuesta grabada y el resto
+       de las regiones celda por celda con listas de vecinas en formato CSR.
+       Solo se actualizan los cables que tienen electrones o que reciben una
+       cabeza desde una region y las compuertas que reciben cabezas"""
+
+    def __init__(self, netlist, matrix):
+        self.netlist = netlist
+        wires = netlist.wires
+
+        # celdas de region
+        cells = [cell for gadget in netlist.gadgets for cell in gadget.cells]
+        index = dict((cell, k) for k, cell in enumerate(cells))
+        self.index = index
+        self.size = len(cells)
+        self.rows = np.array([i for i, j in cells], dtype=np.int64)
+        self.columns = np.array([j for i, j in cells], dtype=np.int64)
+        self.states = np.array([matrix[i][j] for i, j in cells],
+                               dtype=np.uint8)
+
+        # los extremos de los cables ocupan las posiciones 2w y 2w + 1 del
+        # vector de cabezas, despues de las celdas de region
+        ends = {}
+        for w, wire in enumerate(wires):
+            ends[wire.cells[-1]] = len(cells) + 2 * w + 1
+            ends[wire.cells[0]] = len(cells) + 2 * w
+
+        self.feeds = [[] for cell in cells]
+        self.neighbors = [[index[neighbor] if neighbor in index
+                           else ends[neighbor]
+                           for neighbor in netlist.neighbors[cell]]
+                          for cell in cells]
+
+        # estado de los cables
+        self.lengths = [wire.delay for wire in wires]
+        self.masks = [(1 << wire.delay) - 1 for wire in wires]
+        self.heads = [0] * len(wires)
+        self.tails = [0] * len(wires)
+        self.starts = [-1] * len(wires)
+        self.ends = [-1] * len(wires)
+        for w, wire in enumerate(wires):
+            for k, cell in enumerate(wire.cells):
+                if matrix[cell[0]][cell[1]] == 3:
+                    self.heads[w] |= 1 << k
+                if matrix[cell[0]][cell[1]] == 2:
+                    self.tails[w] |= 1 << k
+            if wire.start is not None:
+                self.starts[w] = index[wire.start]
+                self.feeds[self.starts[w]].append(w)
+            if wire.end is not None:
+                self.ends[w] = index[wire.end]
+                self.feeds[self.ends[w]].append(w)
+        self.cyclic = [wire.cyclic for wire in wires]
+
+        self.active = set(w for w in range(len(wires))
+                          if self.heads[w] or self.tails[w])
+        self.changed = set(range(len(wires)))
+
+        # compuertas: (gate, celdas en el orden de gate.points, posiciones
+        # de sus extremos en el vector de cabezas), watch lleva la posicion
+        # de cada extremo a su compuerta, playing lleva cada compuerta que
+        # reproduce una respuesta a (respuesta, paso) y fallback son las que
+        # se simulan celda por celda
+        self.gates = []
+        self.watch = {}
+        for gadget in netlist.gadgets:
+            if gadget.gate is not None:
+                positions = [self.getEnd(w, side) for w, side in gadget.ends]
+                for position in positions:
+                    self.watch[position] = len(self.gates)
+                self.gates.append((gadget.gate, np.array(
+                    [index[cell] for cell in gadget.order], dtype=np.int64),
+                    positions))
+        self.playing = {}
+        self.fallback = set(g for g, (gate, cells, positions)
+                            in enumerate(self.gates)
+                            if (self.states[cells] != 1).any())
+        self.compile()
+
+    def getEnd(self, w, side):
+        """posicion en el vector de cabezas del extremo side(0 inicio, 1
+           final) del cable w"""
+        return self.size + 2 * w + side
+
+    def compile(self):
+        """arma las listas de vecinas en formato CSR de las celdas que se
+           simulan celda por celda"""
+        gated = np.zeros(self.size, dtype=bool)
+        for g, (gate, cells, positions) in enumerate(self.gates):
+            if g not in self.fallback:
+                gated[cells] = True
+        self.cells = np.flatnonzero(~gated)
+
+        indices, indptr = [], [0]
+        for k in self.cells:
+            indices.extend(self.neighbors[k])
+            indptr.append(len(indices))
+        self.indices = np.array(indices, dtype=np.int64)
+        self.indptr = np.array(indptr, dtype=np.int64)
+
+    def getHeads(self):
+        """vector de cabezas: las celdas de region seguidas de los extremos
+           de los cables"""
+        endHeads = np.zeros(2 * len(self.heads), dtype=bool)
+        for w in self.active:
+            endHeads[2 * w] = self.heads[w] & 1
+            endHeads[2 * w + 1] = (self.heads[w] >> (self.lengths[w] - 1)) & 1
+
+        return np.concatenate((self.states == 3, endHeads))
+
+    def stepGates(self, vector, states):
+        """avanza las compuertas que reproducen una respuesta o que reciben
+           cabezas, las que se salen de su respuesta grabada pasan a
+           simularse celda por celda y las que se simulan celda por celda y
+           estan en reposo vuelven a nivel de compuerta"""
+        changed = False
+        for g in list(self.fallback):
+            gate, cells, positions = self.gates[g]
+            if (self.states[cells] == 1).all() and not vector[positions].any():
+                self.fallback.discard(g)
+                changed = True
+
+        touched = set(self.playing)
+        for position in np.flatnonzero(vector[self.size:]) + self.size:
+            if position in self.watch:
+                touched.add(self.watch[position])
+
+        for g in touched - self.fallback:
+            gate, cells, positions = self.gates[g]
+            heads = vector[positions].tobytes()
+
+            if g in self.playing:
+                response, t = self.playing.pop(g)
+            else:
+                response, t = gate.responses.get(heads), 0
+
+            if response is None or response[1][t] != heads:
+                self.fallback.add(g)
+                changed = True
+                continue
+
+            frames = response[0]
+            states[cells] = frames[t + 1]
+            if t + 2 < len(frames):
+                self.playing[g] = (response, t + 1)
+
+        if changed:
+            self.compile()
+
+    def step(self):
+        vector = self.getHeads()
+        heads = vector[:self.size]
+
+        states = self.states.copy()
+        if self.gates:
+            self.stepGates(vector, states)
+
+        alive = np.concatenate(([0], np.cumsum(vector[self.indices])))
+        alive = alive[self.indptr[1:]] - alive[self.indptr[:-1]]
+
+        old = self.states[self.cells]
+        new = old.copy()
+        new[old == 3] = 2
+        new[old == 2] = 1
+        new[(old == 1) & ((alive == 1) | (alive == 2))] = 3
+        states[self.cells] = new
+
+        # cables que reciben una cabeza desde una region
+        wires = set(self.active)
+        for k in np.nonzero(heads)[0]:
+            wires.update(self.feeds[k])
+
+        active = set()
+        for w in wires:
+            length, mask = self.lengths[w], self.masks[w]
+            head, tail = self.heads[w], self.tails[w]
+
+            neighbors = (head << 1) | (head >> 1)
+            if self.cyclic[w]:
+                neighbors |= (head >> (length - 1)) | (
+                    (head & 1) << (length - 1))
+            if self.starts[w] >= 0:
+                neighbors |= int(heads[self.starts[w]])
+            if self.ends[w] >= 0:
+                neighbors |= int(heads[self.ends[w]]) << (length - 1)
+
+            self.heads[w] = neighbors & ~head & ~tail & mask
+            self.tails[w] = head
+            if self.heads[w] or self.tails[w]:
+                active.add(w)
+
+        self.changed.update(wires)
+        self.active = active
+        self.states = states
+
+    def write(self, matrix):
+        """escribe el estado en matrix(arreglo de numpy) y solo toca los
+           cables que cambiaron desde la ultima escritura"""
+        matrix[self.rows, self.columns] = self.states
+
+        for w in self.changed:
+            wire = self.netlist.wires[w]
+            length = self.lengths[w]
+            size = (length + 7) // 8
+
+            values = np.ones(length, dtype=np.uint8)
+            for bits, value in ((self.tails[w], 1), (self.heads[w], 2)):
+                packed = np.frombuffer(bits.to_bytes(size, 'little'),
+                                       dtype=np.uint8)
+                values += value * np.unpackbits(packed,
+                                                bitorder='little')[:length]
+
+            rows, columns = zip(*wire.cells)
+            matrix[list(rows), list(columns)] = values
+
+        self.changed = set()
@@ -1,6 +1,10 @@
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 from cellgraph import CellGraph, System, COLORS
+import pygame.locals as pl
+from collections import Counter
 from copy import deepcopy
+from netlist import Netlist, NetlistSimulator
+import numpy as np
 
 
 class WireWorld(System):
@@ -11,7 +15,7 @@ class WireWorld(System):
         if filename:
             matrix = self.getMatrixFromFile(filename)
         else:
-            matrix = [[0] * width for i in range(height)]
+            matrix = self.emptyMatrix(width, height)
 
         super(WireWorld, self).__init__(matrix, colors, name='Wire World',
                                         possibleValues=[0, 1, 2, 3])
@@ -25,6 +29,10 @@ class WireWorld(System):
         if event.buttons[0]:
             super(WireWorld, self).add(pos, event, self.delete)
 
+    def emptyMatrix(self, width, height):
+        """retorna un tablero vacio en la representacion del motor"""
+        return [[0] * width for i in range(height)]
+
     def __keydown(self, key):
         if key == 'd':
             print('delete mode')
@@ -60,6 +68,526 @@ class WireWorld(System):
         self.matrix = copy
 
 
+class GraphWireWorld(WireWorld):
+    """WireWorld en el que las celdas no vacias(las unicas que cambian) se
+       compilan en un grafo guardado en formato CSR: las vecinas no vacias de
+       la celda k son indices[indptr[k]:indptr[k + 1]]. Cada paso solo cuenta
+       cabezas de electron sobre esas listas. El grafo se vuelve a compilar
+       solo cuando el usuario edita el tablero"""
+
+    def __init__(self, colors, width=None, height=None, filename=None):
+        super(GraphWireWorld, self).__init__(colors, width, height,
+                                             filename=filename)
+
+        self.matrix = np.array(self.matrix, dtype=np.uint8)
+
+        self.events['mousebuttondown'].append(self.__edited)
+        self.events['mousemotion'].append(self.__edited)
+        self.compiled = False
+
+    def __edited(self, pos, event):
+        if event.type == pl.MOUSEBUTTONDOWN or event.buttons[0]:
+            self.compiled = False
+
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix = np.zeros((self.height, self.width), dtype=np.uint8)
+            self.compiled = False
+
+    def compile(self):
+        """construye los arreglos CSR de las celdas no vacias"""
+        self.rows, self.columns = np.nonzero(self.matrix)
+        cells = len(self.rows)
+
+        index = np.full((self.height, self.width), -1, dtype=np.int64)
+        index[self.rows, self.columns] = np.arange(cells)
+
+        sources, targets = [], []
+        for r in (-1, 0, 1):
+            for c in (-1, 0, 1):
+                if r == 0 and c == 0:
+                    continue
+                rows, columns = self.rows + r, self.columns + c
+                inside = np.nonzero((0 <= rows) & (rows < self.height) &
+                                    (0 <= columns) & (columns < self.width))
+                neighbor = index[rows[inside], columns[inside]]
+                conductor = neighbor >= 0
+                sources.append(inside[0][conductor])
+                targets.append(neighbor[conductor])
+
+        sources = np.concatenate(sources)
+        order = np.argsort(sources, kind='stable')
+
+        self.indices = np.concatenate(targets)[order]
+        self.indptr = np.zeros(cells + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=cells),
+                  out=self.indptr[1:])
+        self.compiled = True
+
+    def update(self):
+        if not self.compiled:
+            self.compile()
+
+        states = self.matrix[self.rows, self.columns]
+
+        # suma de cabezas vecinas por fila del CSR con una suma acumulada
+        heads = np.concatenate(([0], np.cumsum(states[self.indices] == 3)))
+        alive = heads[self.indptr[1:]] - heads[self.indptr[:-1]]
+
+        new = states.copy()
+        new[states == 3] = 2
+        new[states == 2] = 1
+        new[(states == 1) & ((alive == 1) | (alive == 2))] = 3
+
+        self.matrix[self.rows, self.columns] = new
+
+
+class EventWireWorld(WireWorld):
+    """WireWorld que guarda las cabezas y colas de electron como conjuntos
+       de posiciones. Una celda solo puede volverse cabeza si es vecina de una
+       cabeza, por lo que cada paso solo recorre las vecinas de las cabezas y
+       su costo es proporcional al numero de electrones"""
+
+    def __init__(self, colors, width=None, height=None, filename=None):
+        super(EventWireWorld, self).__init__(colors, width, height,
+                                             filename=filename)
+
+        self.events['mousebuttondown'].append(self.__edited)
+        self.events['mousemotion'].append(self.__edited)
+
+        self.heads = set()
+        self.tails = set()
+        for i, row in enumerate(self.matrix):
+            for j, value in enumerate(row):
+                self.setCell(i, j, value)
+
+    def __edited(self, pos, _):
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.setCell(y, x, self.matrix[y][x])
+
+    def setCell(self, i, j, value):
+        """actualiza los conjuntos con el valor de la celda i, j"""
+        self.heads.discard((i, j))
+        self.tails.discard((i, j))
+        if value == 3:
+            self.heads.add((i, j))
+        if value == 2:
+            self.tails.add((i, j))
+
+    def clear(self, key):
+        """limpia el tablero"""
+        super(EventWireWorld, self).clear(key)
+        if key == 'c':
+            self.heads = set()
+            self.tails = set()
+
+    def update(self):
+        alive = Counter()
+
+        for i, j in self.heads:
+            for r in range(max(i - 1, 0), min(i + 2, self.height)):
+                for c in range(max(j - 1, 0), min(j + 2, self.width)):
+                    if self.matrix[r][c] == 1:
+                        alive[(r, c)] += 1
+
+        heads = set(cell for cell, count in alive.items() if count <= 2)
+
+        for i, j in self.tails:
+            self.matrix[i][j] = 1
+        for i, j in self.heads:
+            self.matrix[i][j] = 2
+        for i, j in heads:
+            self.matrix[i][j] = 3
+
+        self.tails = self.heads
+        self.heads = heads
+
+
+class NetlistWireWorld(WireWorld):
+    """WireWorld que extrae la netlist del circuito: los cables simples se
+       simulan como lineas de retardo de bits, las compuertas conocidas(diodo,
+       xor, or) reproduciendo su respuesta grabada y el resto de las
+       regiones celda por celda. La netlist se vuelve a extraer cuando el
+       usuario edita el tablero"""
+
+    def __init__(self, colors, width=None, height=None, filename=None):
+        super(NetlistWireWorld, self).__init__(colors, width, height,
+                                               filename=filename)
+
+        self.matrix = np.array(self.matrix, dtype=np.uint8)
+
+        self.events['mousebuttondown'].append(self.__edited)
+        self.events['mousemotion'].append(self.__edited)
+        self.simulator = None
+
+    def __edited(self, pos, event):
+        if event.type == pl.MOUSEBUTTONDOWN or event.buttons[0]:
+            self.simulator = None
+
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix = np.zeros((self.height, self.width), dtype=np.uint8)
+            self.simulator = None
+
+    def compile(self):
+        """extrae la netlist del tablero actual"""
+        self.netlist = Netlist(self.matrix)
+        self.simulator = NetlistSimulator(self.netlist, self.matrix)
+        print(self.netlist.describe())
+
+    def advance(self, steps):
+        """avanza steps pasos y escribe el resultado en el tablero solo al
+           final"""
+        if self.simulator is None:
+            self.compile()
+
+        for step in range(steps):
+            self.simulator.step()
+        self.simulator.write(self.matrix)
+
+    def update(self):
+        self.advance(1)
+
+
+class TileRow(object):
+    """fila de un TileBoard, se comporta como una lista"""
+
+    def __init__(self, board, i):
+        self.board = board
+        self.i = i
+
+    def __len__(self):
+        return self.board.width
+
+    def __getitem__(self, j):
+        return self.board.get(self.i, j)
+
+    def __setitem__(self, j, value):
+        self.board.set(self.i, j, value)
+
+    def __iter__(self):
+        return iter(self.board.getRow(self.i))
+
+
+class TileBoard(object):
+    """tablero guardado como un diccionario de bloques(tiles) de size x size
+       celdas, la llave del bloque de la celda i, j es (i // size, j // size).
+       Solo existen los bloques que tienen alguna celda no vacia, active son
+       los bloques que tienen electrones. Se puede indexar como la lista de
+       listas de System"""
+
+    def __init__(self, width, height, size=32):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.tiles = {}
+        self.active = set()
+
+    @classmethod
+    def fromFile(cls, filename, size=32):
+        """lee el formato de texto de System linea por linea sin construir
+           la matrix completa"""
+        board = cls(0, 0, size)
+
+        with open(filename, 'r') as fichero:
+            for i, line in enumerate(fichero):
+                line = line.replace('\n', '')
+                board.width = max(board.width, len(line))
+                board.height = i + 1
+                for j, char in enumerate(line):
+                    if char != '0':
+                        board.set(i, j, int(char))
+
+        return board
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, i):
+        return TileRow(self, i)
+
+    def __iter__(self):
+        for i in range(self.height):
+            yield self.getRow(i)
+
+    def get(self, i, j):
+        tile = self.tiles.get((i // self.size, j // self.size))
+        if tile is None:
+            return 0
+        return int(tile[i % self.size, j % self.size])
+
+    def set(self, i, j, value):
+        key = (i // self.size, j // self.size)
+        tile = self.tiles.get(key)
+
+        if tile is None:
+            if not value:
+                return
+            tile = np.zeros((self.size, self.size), dtype=np.uint8)
+            self.tiles[key] = tile
+
+        tile[i % self.size, j % self.size] = value
+        if value >= 2:
+            self.active.add(key)
+        if not tile.any():
+            del self.tiles[key]
+            self.active.discard(key)
+
+    def getRow(self, i):
+        """retorna la fila i como una lista"""
+        row = [0] * self.width
+        ti, r = divmod(i, self.size)
+
+        for (tileRow, tj), tile in self.tiles.items():
+            if tileRow == ti:
+                start = tj * self.size
+                row[start:start + self.size] = tile[r].tolist()
+
+        return row[:self.width]
+
+
+class TiledWireWorld(WireWorld):
+    """WireWorld sobre un TileBoard: el fondo vacio no ocupa memoria y cada
+       paso solo calcula los bloques con electrones y sus vecinos, los demas
+       bloques no pueden cambiar"""
+
+    def __init__(self, colors, width=None, height=None, filename=None,
+                 tileSize=32):
+        self.tileSize = tileSize
+
+        super(TiledWireWorld, self).__init__(colors, width, height,
+                                             filename=filename)
+
+    def getMatrixFromFile(self, filename):
+        return TileBoard.fromFile(filename, self.tileSize)
+
+    def emptyMatrix(self, width, height):
+        return TileBoard(width, height, self.tileSize)
+
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix = self.emptyMatrix(self.width, self.height)
+
+    def update(self):
+        board = self.matrix
+        size = board.size
+        tiles = board.tiles
+
+        # origen en el bloque vecino de la fila(o columna) de halo r y de
+        # la zona que cubre en el bloque con halo
+        halo = {-1: (slice(0, 1), slice(size - 1, size)),
+                0: (slice(1, size + 1), slice(0, size)),
+                1: (slice(size + 1, size + 2), slice(0, 1))}
+
+        heads = dict((key, tiles[key] == 3) for key in board.active)
+        candidates = set()
+        for ti, tj in board.active:
+            for r in (-1, 0, 1):
+                for c in (-1, 0, 1):
+                    if (ti + r, tj + c) in tiles:
+                        candidates.add((ti + r, tj + c))
+
+        active = set()
+        padded = np.zeros((size + 2, size + 2), dtype=np.uint8)
+        for ti, tj in candidates:
+            padded[:] = 0
+            for r in (-1, 0, 1):
+                for c in (-1, 0, 1):
+                    neighbor = heads.get((ti + r, tj + c))
+                    if neighbor is not None:
+                        padded[halo[r][0], halo[c][0]] = \
+                            neighbor[halo[r][1], halo[c][1]]
+
+            alive = (padded[:-2, :-2] + padded[:-2, 1:-1] + padded[:-2, 2:] +
+                     padded[1:-1, :-2] + padded[1:-1, 2:] +
+                     padded[2:, :-2] + padded[2:, 1:-1] + padded[2:, 2:])
+
+            tile = tiles[(ti, tj)]
+            new = tile.copy()
+            new[tile == 3] = 2
+            new[tile == 2] = 1
+            new[(tile == 1) & ((alive == 1) | (alive == 2))] = 3
+            tiles[(ti, tj)] = new
+
+            if (new >= 2).any():
+                active.add((ti, tj))
+
+        board.active = active
+
+
+class MultiWireWorld(WireWorld):
+    """instances(a lo sumo 64) copias del mismo circuito con electrones
+       distintos que avanzan juntas: el bit k de heads[i, j] y tails[i, j]
+       indica si la celda i, j es cabeza o cola en la copia k. Los vecinos se
+       cuentan con sumadores de bits que trabajan sobre las 64 copias a la
+       vez. En pantalla se muestra la copia shown, la tecla n pasa a la
+       siguiente"""
+
+    def __init__(self, colors, width=None, height=None, filename=None,
+                 instances=64):
+        super(MultiWireWorld, self).__init__(colors, width, height,
+                                             filename=filename)
+
+        self.instances = instances
+        self.full = np.uint64((1 << instances) - 1)
+        self.shown = 0
+
+        matrix = np.array(self.matrix, dtype=np.uint8)
+        self.conductor = np.where(matrix != 0, self.full, np.uint64(0))
+        self.heads = np.where(matrix == 3, self.full, np.uint64(0))
+        self.tails = np.where(matrix == 2, self.full, np.uint64(0))
+        self.matrix = matrix
+
+        self.events['mousebuttondown'].append(self.__edited)
+        self.events['mousemotion'].append(self.__edited)
+        self.events['keydown'].append(self.__nextInstance)
+
+    def __edited(self, pos, event):
+        """las ediciones con el mouse se aplican a todas las copias, solo en
+           la celda que cambio en la copia que se muestra"""
+        if not (event.type == pl.MOUSEBUTTONDOWN or event.buttons[0]):
+            return
+
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            value = self.matrix[y][x]
+            if value == self.getCell(self.shown, y, x):
+                return
+
+            self.conductor[y, x] = self.full if value else 0
+            self.heads[y, x] = self.full if value == 3 else 0
+            self.tails[y, x] = self.full if value == 2 else 0
+
+    def __nextInstance(self, key):
+        if key == 'n':
+            self.shown = (self.shown + 1) % self.instances
+            self.matrix = self.getState(self.shown)
+
+    def getCaption(self):
+        return '%s %s/%s' % (self.name, self.shown, self.instances)
+
+    def clear(self, key):
+        """limpia el tablero"""
+        if key == 'c':
+            self.matrix = np.zeros((self.height, self.width), dtype=np.uint8)
+            self.conductor[:] = 0
+            self.heads[:] = 0
+            self.tails[:] = 0
+
+    def getState(self, instance):
+        """retorna el tablero de la copia instance"""
+        shift = np.uint64(instance)
+        one = np.uint64(1)
+
+        return ((self.conductor != 0).astype(np.uint8) +
+                ((self.tails >> shift) & one).astype(np.uint8) +
+                2 * ((self.heads >> shift) & one).astype(np.uint8))
+
+    def getCell(self, instance, i, j):
+        """retorna el valor de la celda i, j en la copia instance"""
+        return (int(self.conductor[i, j] != 0) +
+                (int(self.tails[i, j]) >> instance & 1) +
+                2 * (int(self.heads[i, j]) >> instance & 1))
+
+    def setState(self, instance, matrix):
+        """pone en la copia instance los electrones de matrix, el cableado es
+           el mismo en todas las copias"""
+        matrix = np.asarray(matrix)
+        bit = np.uint64(1 << instance)
+
+        self.heads &= ~bit
+        self.tails &= ~bit
+        self.heads[(matrix == 3) & (self.conductor != 0)] |= bit
+        self.tails[(matrix == 2) & (self.conductor != 0)] |= bit
+
+    def setInputs(self, inputs, first=0):
+        """inputs es una lista de pares ((i, j) de la cabeza, (i, j) de la
+           cola), la copia k recibe el electron de la entrada m si el bit m de
+           first + k es 1"""
+        for m, (head, tail) in enumerate(inputs):
+            mask = 0
+            for k in range(self.instances):
+                if (first + k) >> m & 1:
+                    mask |= 1 << k
+            self.heads[head] |= np.uint64(mask)
+            self.tails[tail] |= np.uint64(mask)
+
+    def getProbe(self, i, j):
+        """retorna la lista de las copias en las que la celda i, j es
+           cabeza"""
+        heads = int(self.heads[i, j])
+        return [heads >> k & 1 for k in range(self.instances)]
+
+    def step(self):
+        heads = self.heads
+        padded = np.zeros((self.height + 2, self.width + 2), dtype=np.uint64)
+        padded[1:-1, 1:-1] = heads
+
+        # contador de 2 bits con saturacion de las cabezas vecinas
+        ones = np.zeros_like(heads)
+        twos = np.zeros_like(heads)
+        many = np.zeros_like(heads)
+        for r in range(3):
+            for c in range(3):
+                if r == 1 and c == 1:
+                    continue
+                neighbor = padded[r:r + self.height, c:c + self.width]
+                carry = ones & neighbor
+                ones ^= neighbor
+                many |= twos & carry
+                twos ^= carry
+
+        alive = (ones ^ twos) & ~many
+        self.heads = self.conductor & ~heads & ~self.tails & alive
+        self.tails = heads
+
+    def run(self, steps, probes):
+        """avanza steps pasos y retorna, para cada celda de probes, la
+           mascara de bits de las copias en las que fue cabeza alguna vez"""
+        seen = [0] * len(probes)
+
+        for step in range(steps):
+            self.step()
+            for index, cell in enumerate(probes):
+                seen[index] |= int(self.heads[cell])
+
+        return seen
+
+    def truthTable(self, inputs, probes, steps):
+        """prueba todas las combinaciones de inputs(ver setInputs), 64 por
+           corrida, y retorna una lista de (entradas, salidas) con las
+           salidas 1 si la celda de probes recibio una cabeza en steps pasos.
+           El estado del circuito se restaura al terminar"""
+        heads, tails = self.heads.copy(), self.tails.copy()
+        table = []
+
+        for first in range(0, 1 << len(inputs), self.instances):
+            self.heads, self.tails = heads.copy(), tails.copy()
+            self.setInputs(inputs, first)
+            seen = self.run(steps, probes)
+
+            for k in range(min(self.instances, (1 << len(inputs)) - first)):
+                table.append((
+                    tuple((first + k) >> m & 1 for m in range(len(inputs))),
+                    tuple(mask >> k & 1 for mask in seen)))
+
+        self.heads, self.tails = heads, tails
+        return table
+
+    def update(self):
+        self.step()
+        self.matrix = self.getState(self.shown)
+
+
+ENGINES = {'python': WireWorld, 'graph': GraphWireWorld,
+           'event': EventWireWorld, 'netlist': NetlistWireWorld,
+           'tiled': TiledWireWorld, 'multi': MultiWireWorld}
+
+
 def validateColor(color):
     if len(color) == 3:
         return all(map(lambda x: isinstance(x, int) and 0 <= x <= 255, color))
@@ -154,14 +682,17 @@ Los colores disponibles son:
     parser.add_argument('-fps', '--frame-per-seconds', type=int, dest='fps',
                         default=30, help='''frames por segundo la simulacion
                         corre automaticamente''')
+    parser.add_argument('-e', '--engine', choices=sorted(ENGINES),
+                        default='python', help='''motor con el que se
+                        calcula cada paso''')
 
     args = parser.parse_args()
 
     colors = {0: args.color_empty, 1: args.color_conductor,
               2: args.color_tail, 3: args.color_head}
 
-    gameoflife = WireWorld(colors, args.width, args.height,
-                           filename=args.filename)
+    gameoflife = ENGINES[args.engine](colors, args.width, args.height,
+                                      filename=args.filename)
 
     graph = CellGraph(gameoflife, cellwidth=args.cell_width, fps=args.fps,
                       cellheight=args.cell_height,